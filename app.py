@@ -1,136 +1,168 @@
 import streamlit as st
-import pandas as pd
 from datetime import datetime
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
 import os
 import uuid
-import gspread
-from google.oauth2.service_account import Credentials
-import time
 import math
+from tracing import tracer
 
-def write_debug_log(message):
-    """Append debug message to /tmp/debug_log.txt."""
-    try:
-        with open("/tmp/debug_log.txt", "a") as f:
-            f.write(f"{datetime.now().isoformat()}: {message}\n")
-    except Exception as e:
-        pass  # Silent fail to avoid UI clutter
+# pandas, altair, reportlab and the Google Sheets stack are imported where they are first used:
+# the login page needs none of them, and they dominate cold-start time.
+
+@st.cache_resource
+def get_sheets_pool():
+    from sheets import SheetsPool
+    return SheetsPool(lambda: st.secrets.get("gcp_service_account"))
 
-def get_gsheet_client():
+def get_log_worksheet():
     try:
-        if "gcp_service_account" not in st.secrets:
-            raise ValueError("gcp_service_account not found in st.secrets")
-        secrets = st.secrets["gcp_service_account"]
-        if "private_key" not in secrets:
-            raise ValueError("private_key field missing in service account info")
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        creds = Credentials.from_service_account_info(secrets, scopes=scope)
-        return gspread.authorize(creds)
+        return get_sheets_pool().log_worksheet()
     except Exception as e:
-        write_debug_log(f"Failed to create Google Sheets client: {e}")
+        tracer.log(f"Failed to create Google Sheets client: {e}")
         st.error(f"Failed to create Google Sheets client: {e}")
         raise
 
+@st.cache_resource
+def get_quote_log_writer():
+    from quote_log import QuoteLogWriter
+    # The worker thread has no script context, so it opens the sheet without touching st.error.
+    pool = get_sheets_pool()
+    return QuoteLogWriter(
+        pool.log_worksheet,
+        on_client_error=pool.invalidate,
+        debug_log=tracer.log,
+    ).start()
+
+@tracer.traced("log_to_sheets")
 def log_to_sheets(log_row):
     try:
-        write_debug_log("Starting log_to_sheets")
-        client = get_gsheet_client()
-        sheet = client.open("RedsandQuotes").worksheet("Sheet1")
-        headers = sheet.row_values(1) or [
-            "timestamp", "partner_code", "partner_name", "quote_id", "use_case",
-            "configuration", "gpu_type", "units", "price_per_unit", "redsand_monthly",
-            "redsand_yearly", "redsand_3yr", "margin_monthly", "margin_yearly",
-            "margin_3yr", "customer_monthly", "customer_yearly", "customer_3yr", "pdf_file"
-        ]
-        if not headers:
-            write_debug_log("Sheet is empty, setting headers")
-            sheet.append_row(headers)
-        row_to_append = [str(log_row.get(h, "")) for h in headers]
-        for attempt in range(3):
-            try:
-                write_debug_log(f"Attempt {attempt + 1} to write row: {row_to_append}")
-                sheet.append_row(row_to_append)
-                write_debug_log("Successfully logged to Google Sheets")
-                st.session_state.quote_logged = True
-                st.info("📤 Quote logged to Redsand")
-                return
-            except gspread.exceptions.APIError as e:
-                write_debug_log(f"APIError on attempt {attempt + 1}: {e}")
-                if attempt < 2:
-                    time.sleep(2 ** attempt)
-                else:
-                    st.error(f"Google Sheets logging failed after retries: {e}")
-                    write_debug_log("Logging failed after retries")
-                    # Fallback: Save to CSV
-                    try:
-                        failed_log = pd.DataFrame([log_row])
-                        failed_log.to_csv("/tmp/failed_logs.csv", mode='a', index=False, header=not os.path.exists("/tmp/failed_logs.csv"))
-                        write_debug_log("Saved failed log to /tmp/failed_logs.csv")
-                    except Exception as csv_e:
-                        write_debug_log(f"Failed to save to CSV: {csv_e}")
+        get_quote_log_writer().submit(log_row)
+        tracer.log(f"Queued quote {log_row.get('quote_id')} for Google Sheets")
+        st.session_state.quote_logged = True
+        st.info("📤 Quote logged to Redsand")
     except Exception as e:
-        write_debug_log(f"General error in log_to_sheets: {e}")
+        tracer.log(f"General error in log_to_sheets: {e}")
         st.error(f"Google Sheets logging failed: {e}")
-        # Fallback: Save to CSV
+        # Fallback: Save to CSV (replayed by the writer on next start)
         try:
+            import pandas as pd
+            from quote_log import FAILED_LOGS_CSV
             failed_log = pd.DataFrame([log_row])
-            failed_log.to_csv("/tmp/failed_logs.csv", mode='a', index=False, header=not os.path.exists("/tmp/failed_logs.csv"))
-            write_debug_log("Saved failed log to /tmp/failed_logs.csv")
+            failed_log.to_csv(FAILED_LOGS_CSV, mode='a', index=False, header=not os.path.exists(FAILED_LOGS_CSV))
+            tracer.log(f"Saved failed log to {FAILED_LOGS_CSV}")
         except Exception as csv_e:
-            write_debug_log(f"Failed to save to CSV: {csv_e}")
-
-@st.cache_data(ttl=60)
-def fetch_gsheet_log():
+            tracer.log(f"Failed to save to CSV: {csv_e}")
+
+@st.cache_resource
+def get_pdf_cache():
+    from pdf_quote import QuotePdfCache
+    return QuotePdfCache()
+
+@st.cache_resource
+def get_render_pool():
+    # One bounded pool of render processes for every session's quote packs.
+    from bulk_quotes import render_pool
+    return render_pool()
+
+@st.cache_resource
+def get_quote_log_store():
+    from log_store import QuoteLogStore
+    return QuoteLogStore()
+
+def sync_quote_log():
+    """Pull newly appended sheet rows into the local store at most once a minute."""
+    from gspread.exceptions import APIError
+    from sheets import is_retryable
+    store = get_quote_log_store()
     try:
-        client = get_gsheet_client()
-        sheet = client.open("RedsandQuotes").worksheet("Sheet1")
-        expected_headers = [
-            "timestamp", "partner_code", "partner_name", "quote_id", "use_case",
-            "configuration", "gpu_type", "units", "price_per_unit", "redsand_monthly",
-            "redsand_yearly", "redsand_3yr", "margin_monthly", "margin_yearly",
-            "margin_3yr", "customer_monthly", "customer_yearly", "customer_3yr", "pdf_file"
-        ]
-        for attempt in range(3):
-            try:
-                data = sheet.get_all_records(expected_headers=expected_headers)
-                if not data:
-                    return pd.DataFrame(columns=expected_headers)
-                return pd.DataFrame(data)
-            except gspread.exceptions.APIError as e:
-                write_debug_log(f"APIError in fetch_gsheet_log, attempt {attempt + 1}: {e}")
-                if "429" in str(e) and attempt < 2:
-                    wait_time = 2 ** attempt
-                    st.warning(f"Quota limit hit. Retrying in {wait_time} seconds...")
-                    time.sleep(wait_time)
-                else:
-                    raise
-        st.error("Failed to fetch Google Sheets log after retries (quota exceeded). Please wait a minute and try again.")
-        return pd.DataFrame(columns=expected_headers)
+        with tracer.span("fetch_gsheet_log"):
+            added = store.sync_if_stale(get_log_worksheet, max_age=60)
+        if added:
+            tracer.log(f"Synced {added} new quote log rows")
+    except APIError as e:
+        tracer.log(f"APIError in fetch_gsheet_log: {e}")
+        if is_retryable(e):
+            st.warning("Quota limit hit while syncing the quote log. Showing the last synced data.")
+        else:
+            st.error(f"Failed to fetch Google Sheets log: {e}")
     except Exception as e:
-        write_debug_log(f"General error in fetch_gsheet_log: {e}")
+        tracer.log(f"General error in fetch_gsheet_log: {e}")
         st.error(f"Failed to fetch Google Sheets log: {e}")
-        return pd.DataFrame(columns=expected_headers)
+    return store
+
+@st.cache_resource
+def get_log_snapshots():
+    from log_snapshot import QuoteLogSnapshot, SnapshotPublisher
+    return SnapshotPublisher(lambda store: QuoteLogSnapshot.from_store(store, version=store.version), name="quote-log-snapshot")
+
+def get_log_snapshot():
+    """Latest published snapshot; a sync that added rows rebuilds it in the background."""
+    store = sync_quote_log()
+    return get_log_snapshots().get(store.version, store)
+
+def fetch_gsheet_log(partner_code=None):
+    """Quote log rows as a shared, read-only Arrow table; one partner's rows are a zero-copy slice."""
+    snapshot = get_log_snapshot()
+    return snapshot.table if partner_code is None else snapshot.partner_rows(partner_code)
+
+@st.cache_resource
+def get_log_exporter():
+    from log_export import LogExporter
+    return LogExporter()
+
+@st.cache_resource
+def get_quote_rollups():
+    from rollups import QuoteRollups
+    return QuoteRollups()
+
+@st.cache_resource
+def get_log_views():
+    from log_snapshot import SnapshotPublisher
+    from log_view import QuoteLogView
+    return SnapshotPublisher(lambda snapshot: QuoteLogView(snapshot.table.to_pandas(), version=snapshot.version), name="quote-log-view")
+
+def get_log_view():
+    """Typed, indexed admin view of the latest snapshot, rebuilt in the background when it changes."""
+    snapshot = get_log_snapshot()
+    return get_log_views().get(snapshot.version, snapshot)
 
 st.set_page_config(page_title="Redsand Partner Portal", layout="wide")
 ADMIN_EMAIL = "sdama@redsand.ai"
 
-@st.cache_data
-def load_data():
-    workloads = pd.read_csv("workloads.csv")
-    upgrade_rules = pd.read_csv("gpu_upgrade_rules.csv")
-    pricing = pd.read_csv("pricing.csv")
-    configs = pd.read_csv("redbox_configs.csv")
-    credentials = pd.read_csv("partner_credentials.csv")
-    if "margin_percent" in credentials.columns:
-        credentials["margin_percent"] = pd.to_numeric(credentials["margin_percent"], errors="coerce").fillna(0)
-    return workloads, upgrade_rules, pricing, configs, credentials
-
-workloads, upgrade_rules, pricing, configs, credentials = load_data()
+@st.cache_resource
+def get_catalog_store():
+    from catalog_store import CatalogStore
+    return CatalogStore()
+
+def load_catalog():
+    """Current catalog snapshot; CSV edits are picked up on the next rerun without a restart."""
+    return get_catalog_store().current()
+
+@st.cache_resource(max_entries=64)
+def get_price_curve(catalog_version, use_case, partner_margin):
+    from quote_engine import price_curve
+    return price_curve(catalog.workloads, catalog.upgrade_rules, catalog.pricing, catalog.configs, use_case, partner_margin)
+
+@st.cache_resource(max_entries=256)
+def get_config_mixes(catalog_version, use_case, num_users):
+    from sizing import recommend_mixes
+    return recommend_mixes(catalog, use_case, num_users)
+
+def price_curve_chart(curve, max_users, num_users, max_points=2000):
+    import altair as alt
+    import pandas as pd
+    visible = curve[curve["users_from"] <= max_users]
+    if len(visible) > max_points:
+        visible = visible.iloc[::math.ceil(len(visible) / max_points)]
+    data = visible.rename(columns={
+        "customer_monthly": "Customer", "redsand_monthly": "Redsand", "margin_monthly": "Partner Margin"
+    }).melt("users_from", ["Customer", "Redsand", "Partner Margin"], var_name="Series", value_name="Monthly USD")
+    steps = alt.Chart(data).mark_line(interpolate="step-after").encode(
+        x=alt.X("users_from:Q", title="Concurrent Users"),
+        y=alt.Y("Monthly USD:Q"),
+        color="Series:N",
+    )
+    marker = alt.Chart(pd.DataFrame({"users": [num_users]})).mark_rule(strokeDash=[4, 4]).encode(x="users:Q")
+    return steps + marker
 
 # ---------------- SESSION KEYS ----------------
 if "page" not in st.session_state:
@@ -146,6 +178,13 @@ if "quote_id" not in st.session_state:
 if "quote_logged" not in st.session_state:
     st.session_state["quote_logged"] = False
 
+# The login page renders without the catalog; it is loaded on the first login attempt.
+if st.session_state["page"] != "login":
+    catalog = load_catalog()
+
+# Ended at the bottom of the script; reruns triggered by go_to() leave it unrecorded.
+page_span = tracer.begin(f"page.{st.session_state['page']}")
+
 # ---------------- SAFE LOGOUT ----------------
 def safe_logout():
     for key in list(st.session_state.keys()):
@@ -177,11 +216,12 @@ if st.session_state["page"] == "login":
             st.session_state['logged_in'] = True
             go_to("welcome")
         else:
-            match = credentials[(credentials['partner_code'] == login_input) & (credentials['password'] == password_input)]
-            if not match.empty:
-                st.session_state['partner_name'] = match.iloc[0]['partner_name']
-                st.session_state['partner_code'] = match.iloc[0]['partner_code']
-                st.session_state['partner_margin'] = float(match.iloc[0]['margin_percent']) if 'margin_percent' in match.columns else 0
+            catalog = load_catalog()
+            partner = catalog.authenticate(login_input, password_input)
+            if partner is not None:
+                st.session_state['partner_name'] = partner.partner_name
+                st.session_state['partner_code'] = partner.partner_code
+                st.session_state['partner_margin'] = partner.margin_percent
                 st.session_state['admin'] = False
                 st.session_state['logged_in'] = True
                 go_to("welcome")
@@ -190,6 +230,11 @@ if st.session_state["page"] == "login":
 
 # ---------------- WELCOME PAGE ----------------
 elif st.session_state["page"] == "welcome" and st.session_state.get("logged_in") and not st.session_state.get("admin"):
+    import pandas as pd
+    from quote_engine import curve_point
+    from concurrent.futures.process import BrokenProcessPool
+    from bulk_quotes import RENDER_WORKERS, price_scenarios, rejected_summary, build_quote_pack, log_rows as bulk_log_rows
+
     if os.path.exists("Redsand Logo_White.png"):
         st.image("Redsand Logo_White.png", width=200)
     st.subheader(f"🔐 Welcome, {st.session_state['partner_name']}")
@@ -207,37 +252,29 @@ elif st.session_state["page"] == "welcome" and st.session_state.get("logged_in")
         if "Auto" in selected_mode:
             selected_use_case = st.selectbox(
                 "Select Use Case",
-                workloads["workload_name"].unique(),
+                catalog.workload_names,
                 key="welcome_use_case"
             )
-            num_users = st.number_input("Number of Concurrent Users", min_value=1, step=1, key="welcome_users")
-
-            # --- Auto logic driven by workloads + upgrade rules ---
-            workload_row = workloads[workloads["workload_name"] == selected_use_case].iloc[0]
-            base_gpu = workload_row["gpu_type"]
-            users_per_unit = workload_row["users_per_unit"]
-
-            # Always at least 1 unit
-            preview_units = max(1, math.ceil(num_users / users_per_unit))
-
-            # Apply upgrade rules if thresholds are exceeded
-            upgrade = upgrade_rules[
-                (upgrade_rules["current_gpu"] == base_gpu) &
-                (num_users >= upgrade_rules["user_threshold"])
-            ]
-            preview_gpu = upgrade.iloc[0]["upgrade_gpu"] if not upgrade.empty else base_gpu
+            sweep_mode = st.toggle("📈 Sweep mode", key="sweep_mode")
+            if sweep_mode:
+                # Whole-range curve is computed once per (use case, margin); the slider just looks it up.
+                curve = get_price_curve(catalog.version, selected_use_case, float(st.session_state.get("partner_margin", 0)))
+                sweep_max = st.select_slider("Sweep range (max users)", options=[100, 1_000, 10_000, 100_000, 1_000_000], value=10_000, key="sweep_max")
+                num_users = st.slider("Number of Concurrent Users", min_value=1, max_value=sweep_max, key="sweep_users")
+                step = curve_point(curve, num_users)
+                preview_units, preview_gpu, preview_config = int(step["units"]), step["gpu_type"], step["configuration"]
+                st.caption(f"Same sizing for {step['users_from']:,}–{step['users_to']:,} users")
+                st.altair_chart(price_curve_chart(curve, sweep_max, num_users))
+            else:
+                num_users = st.number_input("Number of Concurrent Users", min_value=1, step=1, key="welcome_users")
 
-            # Match config by upgraded GPU
-            matching_configs = configs[configs["gpu_type"] == preview_gpu]
-            preview_config = matching_configs.iloc[0]["configuration_name"] if not matching_configs.empty else "Unknown"
+                # --- Auto logic driven by workloads + upgrade rules ---
+                preview_units, preview_gpu, preview_config = catalog.auto_size(selected_use_case, num_users)
 
         else:  # Manual mode
-            preview_config = st.selectbox("Choose Configuration", configs["configuration_name"].unique(), key="manual_select")
+            preview_config = st.selectbox("Choose Configuration", catalog.config_names, key="manual_select")
             preview_units = st.number_input("Units", min_value=1, step=1, key="manual_qty")
-            if not configs[configs["configuration_name"] == preview_config].empty:
-                preview_gpu = configs[configs["configuration_name"] == preview_config].iloc[0]["gpu_type"]
-            else:
-                preview_gpu = "Unknown"
+            preview_gpu = catalog.gpu_for_config(preview_config)
 
         st.markdown("#### 🔧 Configuration Preview")
         st.write(f"**Mode:** {selected_mode}")
@@ -246,6 +283,19 @@ elif st.session_state["page"] == "welcome" and st.session_state.get("logged_in")
         st.write(f"**Configuration:** {preview_config}")
         st.write(f"**Units:** {preview_units}")
 
+        if "Auto" in selected_mode:
+            with st.expander("💡 Cost-Optimised Alternatives", key="mix_alternatives", on_change="rerun"):
+                # Solved only while the expander is open, so slider drags don't pay for it.
+                if st.session_state.get("mix_alternatives"):
+                    mix_gpu, mixes = get_config_mixes(catalog.version, selected_use_case, int(num_users))
+                    if mixes.empty:
+                        st.info("No priced configurations can cover this demand.")
+                    else:
+                        st.caption("Cheapest mixes of RedBox configurations covering GPU and storage demand (supplied / required). "
+                                   f"GPUs are counted in {mix_gpu} equivalents, scaled by relative GPU throughput.")
+                        st.dataframe(mixes.assign(**{"Monthly Cost": mixes["Monthly Cost"].map(lambda v: f"${v:,.0f}")}),
+                                     hide_index=True)
+
         # Save to session
         st.session_state["preview_config"] = preview_config
         st.session_state["preview_gpu"] = preview_gpu
@@ -265,27 +315,70 @@ elif st.session_state["page"] == "welcome" and st.session_state.get("logged_in")
             if st.button("🔓 Logout", key="logout_welcome2"):
                 safe_logout()
 
+        with st.expander("📦 Bulk Quote Pack"):
+            st.caption("Upload a CSV with `use_case` + `users` or `configuration` + `units` per row, "
+                       "and optionally `customer`. Quotes use your partner margin.")
+            bulk_file = st.file_uploader("Scenarios CSV", type="csv", key="bulk_scenarios")
+            bulk_format = st.radio("Output", ["ZIP of PDFs", "Merged PDF"], horizontal=True, key="bulk_format")
+            if bulk_format == "Merged PDF":
+                st.caption("A merged PDF is built as one document, one page after another; "
+                           "a ZIP of PDFs renders quotes in parallel and is faster for large packs.")
+            if bulk_file is not None and st.button("Generate Quote Pack", key="bulk_generate"):
+                try:
+                    # Partners always quote at their own margin; a partner_margin column is ignored here.
+                    priced, rejected = price_scenarios(
+                        pd.read_csv(bulk_file, dtype=str, keep_default_na=False), catalog.workloads,
+                        catalog.upgrade_rules, catalog.pricing, catalog.configs, st.session_state['partner_name'],
+                        st.session_state.get('partner_margin', 0), row_margins=False
+                    )
+                    if rejected:
+                        st.warning(rejected_summary(rejected))
+                    unpriced = priced["price_per_unit"].isna()
+                    if unpriced.any():
+                        st.warning(f"Skipping {int(unpriced.sum())} scenarios with no matching configuration or price.")
+                        priced = priced[~unpriced].reset_index(drop=True)
+                    if not priced.empty:
+                        fmt = "pdf" if bulk_format == "Merged PDF" else "zip"
+                        pack_name = f"Redsand_Quotes_{st.session_state.get('partner_code','')}_{datetime.now().strftime('%Y%m%d%H%M%S')}.{fmt}"
+                        with st.spinner(f"Rendering {len(priced)} quotes..."):
+                            pack, names = build_quote_pack(priced, fmt=fmt, workers=RENDER_WORKERS,
+                                                           pool=get_render_pool())
+                        # The whole pack goes to the sheet as one append, never mixed with other sessions' rows.
+                        get_quote_log_writer().submit_many(
+                            bulk_log_rows(priced, st.session_state.get('partner_code', ''), pack_name, names),
+                            batch=uuid.uuid4().hex,
+                        )
+                        st.download_button(
+                            f"⬇️ Download {len(priced)} Quotes", pack, file_name=pack_name,
+                            mime="application/pdf" if fmt == "pdf" else "application/zip"
+                        )
+                except BrokenProcessPool as e:
+                    get_render_pool.clear()  # a render process died; start a fresh pool next time
+                    st.error(f"Bulk quote generation failed: {e}")
+                except Exception as e:
+                    st.error(f"Bulk quote generation failed: {e}")
+
     with col_right:
         st.markdown("### 🔍 Compare Configurations")
         compare_configs = st.multiselect(
             "Choose configurations to compare",
-            configs["configuration_name"].unique(),
+            catalog.config_names,
             key="compare_configs_welcome"
         )
         if compare_configs:
-            compare_df = pricing[pricing["configuration_name"].isin(compare_configs)].merge(
-                configs, on="configuration_name", how="left"
-            )
-            st.dataframe(compare_df.set_index("configuration_name"))
+            st.dataframe(catalog.comparison.loc[compare_configs], column_config={
+                "Monthly Price (USD)": st.column_config.NumberColumn(format="$%,.0f"),
+                "$/GPU-month": st.column_config.NumberColumn(format="$%,.0f"),
+                "$/TB Storage-month": st.column_config.NumberColumn(format="$%,.0f"),
+            })
 
         st.divider()
         st.markdown("### 📚 My Quote History")
         partner_code = st.session_state.get('partner_code')
-        full_log = fetch_gsheet_log()
-        if not full_log.empty and partner_code:
-            partner_log = full_log[full_log['partner_code'].astype(str) == str(partner_code)]
-            if not partner_log.empty:
-                st.dataframe(partner_log.sort_values("timestamp", ascending=False))
+        if partner_code:
+            partner_log = fetch_gsheet_log(partner_code)
+            if partner_log.num_rows:
+                st.dataframe(partner_log)
             else:
                 st.info("No previous quotes found for this partner.")
         else:
@@ -293,6 +386,9 @@ elif st.session_state["page"] == "welcome" and st.session_state.get("logged_in")
             
 # ---------------- QUOTE SUMMARY PAGE ----------------
 elif st.session_state["page"] == "quote_summary" and st.session_state.get("logged_in"):
+    import pandas as pd
+    from quote_engine import log_values, price_quote
+
     if os.path.exists("Redsand Logo_White.png"):
         st.image("Redsand Logo_White.png", width=200)
     st.subheader("🧾 Quote Summary")
@@ -309,26 +405,14 @@ elif st.session_state["page"] == "quote_summary" and st.session_state.get("logge
     partner_name = st.session_state.get("partner_name", "Partner")
     partner_margin = st.session_state.get("partner_margin", 0)
 
-    price_row = pricing[pricing["configuration_name"] == selected_config]
-    if price_row.empty:
+    price_per_unit = catalog.price(selected_config)
+    if price_per_unit is None:
         st.error(f"No pricing found for {selected_config}.")
     else:
-        price_per_unit = price_row["monthly_price_usd"].values[0]
-
-        # --- Constant customer price ---
-        customer_monthly = price_per_unit * num_units
-        customer_yearly = customer_monthly * 12
-        customer_3yr = customer_yearly * 3
-
-        # --- Partner margin extracted ---
-        margin_monthly = customer_monthly * (partner_margin / 100)
-        margin_yearly = margin_monthly * 12
-        margin_3yr = margin_yearly * 3
-
-        # --- Redsand base adjusts dynamically ---
-        redsand_monthly = customer_monthly - margin_monthly
-        redsand_yearly = customer_yearly - margin_yearly
-        redsand_3yr = customer_3yr - margin_3yr
+        quote = price_quote(price_per_unit, num_units, partner_margin)
+        customer_monthly, customer_yearly, customer_3yr = quote["customer_monthly"], quote["customer_yearly"], quote["customer_3yr"]
+        margin_monthly, margin_yearly, margin_3yr = quote["margin_monthly"], quote["margin_yearly"], quote["margin_3yr"]
+        redsand_monthly, redsand_yearly, redsand_3yr = quote["redsand_monthly"], quote["redsand_yearly"], quote["redsand_3yr"]
 
         # ---------------- STREAMLIT TABLE ----------------
         pricing_table = pd.DataFrame({
@@ -362,66 +446,18 @@ elif st.session_state["page"] == "quote_summary" and st.session_state.get("logge
 
         # ---------------- PDF GENERATION + LOG ----------------
         if st.button("📄 Generate & Download Quote PDF", key="generate_download_pdf"):
-            filename = f"/tmp/Redsand_Config_{st.session_state.get('partner_code','')}_{datetime.now().strftime('%Y%m%d%H%M%S')}.pdf"
+            filename = f"Redsand_Config_{st.session_state.get('partner_code','')}_{datetime.now().strftime('%Y%m%d%H%M%S')}.pdf"
 
             try:
-                doc = SimpleDocTemplate(filename, pagesize=A4, rightMargin=40, leftMargin=40, topMargin=60, bottomMargin=40)
-                styles = getSampleStyleSheet()
-                story = []
-
-                logo_path = "Redsand Logo_White.png"
-                if os.path.exists(logo_path):
-                    logo = Image(logo_path)
-                    logo._restrictSize(1.8*inch, 0.6*inch)
-                else:
-                    logo = Paragraph("<b>Redsand.ai</b>", ParagraphStyle('fallbackLogo', fontSize=20, textColor=colors.HexColor("#d71920")))
-
-                header = [[Paragraph("Redsand Partner Configuration Summary", styles['Title']), logo]]
-                ht = Table(header, colWidths=[4.5*inch, 1.8*inch])
-                story.append(ht)
-                story.append(Spacer(1, 12))
-
-                config_data = [
-                    ["Use Case", use_case],
-                    ["GPU Type", final_gpu],
-                    ["Configuration", selected_config],
-                    ["Units", num_units]
-                ]
-                config_table = Table([["Field", "Value"]] + config_data, hAlign='LEFT')
-                config_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-                    ('GRID', (0,0), (-1,-1), 0.25, colors.grey)
-                ]))
-                story.append(config_table)
-                story.append(Spacer(1, 18))
-
-                wrap_style = ParagraphStyle(name="wrap", fontSize=9, leading=11, alignment=1)
-                pdf_pricing = [
-                    [Paragraph("Period", wrap_style),
-                     Paragraph("Base Redsand Price", wrap_style),
-                     Paragraph(f"Partner Margin ({partner_margin}%) – {partner_name}", wrap_style),
-                     Paragraph("Final Customer Price", wrap_style)],
-                    ["Monthly", f"${redsand_monthly:,.0f}", f"${margin_monthly:,.0f}", f"${customer_monthly:,.0f}"],
-                    ["Yearly", f"${redsand_yearly:,.0f}", f"${margin_yearly:,.0f}", f"${customer_yearly:,.0f}"],
-                    ["3-Year Total", f"${redsand_3yr:,.0f}", f"${margin_3yr:,.0f}", f"${customer_3yr:,.0f}"]
-                ]
-                pricing_table_pdf = Table(pdf_pricing, hAlign='LEFT', colWidths=[80, 120, 170, 150])
-                pricing_table_pdf.setStyle(TableStyle([
-                    ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-                    ('GRID', (0,0), (-1,-1), 0.25, colors.grey),
-                    ('ALIGN', (1,1), (-1,-1), 'RIGHT'),
-                    ('VALIGN', (0,0), (-1,-1), 'MIDDLE')
-                ]))
-                story.append(pricing_table_pdf)
-
-                disclaimer = ("<b>Disclaimer:</b> The pricing provided in this summary is indicative only. "
-                              "Final pricing will vary based on the actual configuration including RAM, storage, special hardware features, "
-                              "service-level agreements, hardware availability, and customer-specific requirements. "
-                              "Please contact Redsand at <b>hello@redsand.ai</b> for an official quote or custom configuration.")
-                story.append(Spacer(1, 18))
-                story.append(Paragraph(disclaimer, ParagraphStyle('Disclaimer', fontSize=9, textColor=colors.grey, leading=12)))
-
-                doc.build(story)
+                pdf_bytes = get_pdf_cache().get({
+                    "use_case": use_case,
+                    "gpu_type": final_gpu,
+                    "configuration": selected_config,
+                    "units": num_units,
+                    "partner_name": partner_name,
+                    "partner_margin": partner_margin,
+                    **quote,
+                })
 
                 # --- Log after PDF generation ---
                 log_row = {
@@ -432,24 +468,13 @@ elif st.session_state["page"] == "quote_summary" and st.session_state.get("logge
                     "use_case": use_case,
                     "configuration": selected_config,
                     "gpu_type": final_gpu,
-                    "units": str(num_units),
-                    "price_per_unit": str(price_per_unit),
-                    "redsand_monthly": str(redsand_monthly),
-                    "redsand_yearly": str(redsand_yearly),
-                    "redsand_3yr": str(redsand_3yr),
-                    "margin_monthly": str(margin_monthly),
-                    "margin_yearly": str(margin_yearly),
-                    "margin_3yr": str(margin_3yr),
-                    "customer_monthly": str(customer_monthly),
-                    "customer_yearly": str(customer_yearly),
-                    "customer_3yr": str(customer_3yr),
+                    **log_values(num_units, price_per_unit, quote),
                     "pdf_file": filename
                 }
                 log_to_sheets(log_row)
 
                 # --- Provide download ---
-                with open(filename, "rb") as f:
-                    st.download_button("⬇️ Download Your Quote PDF", f, file_name=os.path.basename(filename))
+                st.download_button("⬇️ Download Your Quote PDF", pdf_bytes, file_name=filename, mime="application/pdf")
 
             except Exception as e:
                 st.error(f"PDF generation failed: {e}")
@@ -467,6 +492,11 @@ elif st.session_state["page"] == "quote_summary" and st.session_state.get("logge
 
 # ------------------ ADMIN PANEL ------------------
 elif st.session_state["page"] == "welcome" and st.session_state.get("logged_in") and st.session_state.get("admin"):
+    import numpy as np
+    import pandas as pd
+    from log_export import EXPORT_FORMATS
+    from rollups import ROLLUP_VALUES
+
     if os.path.exists("Redsand Logo_White.png"):
         st.image("Redsand Logo_White.png", width=200)
     st.subheader("🛠️ Admin Panel — All Quotes")
@@ -474,53 +504,100 @@ elif st.session_state["page"] == "welcome" and st.session_state.get("logged_in")
     if st.button("🔓 Logout", key="logout_admin"):
         safe_logout()
 
-    full_log = fetch_gsheet_log()
-    if not full_log.empty:
-        full_log["timestamp"] = pd.to_datetime(full_log["timestamp"], errors="coerce")
-        total_quotes = len(full_log)
-        total_partners = full_log["partner_name"].nunique()
-        latest_quote_date = full_log["timestamp"].max().strftime("%d %b %Y %H:%M") if not full_log.empty else "N/A"
-
+    if get_catalog_store().last_error:
+        st.warning(f"⚠️ Catalog reload rejected, still serving version {catalog.version}: {get_catalog_store().last_error}")
+    for line, code, reason in catalog.partners.rejected:
+        st.warning(f"⚠️ partner_credentials.csv line {line} ({code or 'no code'}) ignored: {reason}")
+    dead_letters = get_quote_log_writer().dead_letters()
+    if dead_letters:
+        st.warning(f"⚠️ Google Sheets rejected {dead_letters} quote log rows; they are held in the spool's dead-letter table.")
+        if st.button("Retry rejected log rows", key="requeue_dead_letters"):
+            get_quote_log_writer().requeue_dead_letters()
+
+    log_view = get_log_view()
+    if len(log_view):
+        latest = log_view.max_timestamp
         col1, col2, col3 = st.columns(3)
-        col1.metric("📄 Total Quotes", total_quotes)
-        col2.metric("👥 Total Partners", total_partners)
-        col3.metric("🕒 Latest Quote", latest_quote_date)
-
-        partner_options = ["All"] + sorted(full_log["partner_name"].dropna().unique().tolist())
+        col1.metric("📄 Total Quotes", len(log_view))
+        col2.metric("👥 Total Partners", len(log_view.partner_names))
+        col3.metric("🕒 Latest Quote", latest.strftime("%d %b %Y %H:%M") if latest is not None else "N/A")
+
+        rollups = get_quote_rollups().refresh(get_quote_log_store())
+        totals = rollups.totals()
+        col4, col5, col6 = st.columns(3)
+        col4.metric("💵 Customer Monthly (quoted)", f"${totals['customer_monthly']:,.0f}")
+        col5.metric("🏢 Redsand Monthly (quoted)", f"${totals['redsand_monthly']:,.0f}")
+        col6.metric("🤝 Partner Margin Monthly", f"${totals['margin_monthly']:,.0f}")
+
+        with st.expander("📈 Revenue & Margin Trends"):
+            tab_month, tab_partner, tab_config, tab_gpu = st.tabs(["By Month", "By Partner", "By Configuration", "By GPU"])
+            with tab_month:
+                st.line_chart(rollups.by("month")[ROLLUP_VALUES])
+                st.bar_chart(rollups.by("month")["quotes"])
+            for tab, dimension in [(tab_partner, "partner_name"), (tab_config, "configuration"), (tab_gpu, "gpu_type")]:
+                with tab:
+                    table = rollups.by(dimension)
+                    st.bar_chart(table[ROLLUP_VALUES])
+                    st.dataframe(table.astype({"quotes": int}).round(0))
+
+        partner_options = ["All"] + log_view.partner_names
         selected_partner = st.selectbox("Filter by Partner", partner_options, key="admin_partner_filter")
 
-        min_date = full_log["timestamp"].min().date() if not full_log.empty else datetime.today().date()
-        max_date = full_log["timestamp"].max().date() if not full_log.empty else datetime.today().date()
-        start_date, end_date = st.date_input(
+        min_date = log_view.min_timestamp.date() if log_view.min_timestamp is not None else datetime.today().date()
+        max_date = latest.date() if latest is not None else datetime.today().date()
+        date_range = st.date_input(
             "Filter by Date Range",
             [min_date, max_date],
             min_value=min_date,
             max_value=max_date,
             key="admin_date_filter"
         )
+        # While the user is mid-selection the widget holds a single date.
+        start_date, end_date = date_range if len(date_range) == 2 else (None, None)
 
         search_quote_id = st.text_input("Search by Quote ID", key="admin_quote_search")
 
-        filtered_log = full_log
-        if selected_partner != "All":
-            filtered_log = filtered_log[filtered_log["partner_name"].astype(str) == str(selected_partner)]
-        if len([start_date, end_date]) == 2:
-            filtered_log = filtered_log[
-                (filtered_log["timestamp"].dt.date >= start_date) &
-                (filtered_log["timestamp"].dt.date <= end_date)
-            ]
-        if search_quote_id.strip():
-            filtered_log = filtered_log[filtered_log["quote_id"].astype(str).str.contains(search_quote_id.strip(), case=False, na=False)]
+        positions = log_view.filter(
+            partner_name=None if selected_partner == "All" else selected_partner,
+            start_date=start_date,
+            end_date=end_date,
+            quote_id_prefix=search_quote_id,
+        )
 
-        st.dataframe(filtered_log.sort_values("timestamp", ascending=False))
-        st.download_button(
+        page_col1, page_col2 = st.columns([1, 3])
+        page_size = page_col1.selectbox("Rows per page", [50, 100, 500, 1000], key="admin_page_size")
+        page_count = max(1, -(-len(positions) // page_size))
+        page_number = page_col2.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, step=1, key="admin_page")
+        st.caption(f"{len(positions)} matching quotes")
+        st.dataframe(log_view.page(positions, page_number, page_size))
+        # The export is only written when the button is clicked, and reused for the same filters.
+        export_col1, export_col2 = st.columns([1, 3])
+        export_format = export_col1.radio("Export format", list(EXPORT_FORMATS), horizontal=True, key="admin_export_format")
+        export_key = (selected_partner, start_date, end_date, search_quote_id)
+        suffix, mime = EXPORT_FORMATS[export_format]
+        export_col2.download_button(
             "📥 Download Filtered Log",
-            filtered_log.to_csv(index=False),
-            file_name="config_log.csv"
+            lambda: get_log_exporter().export(log_view, positions, export_key, export_format),
+            file_name=f"config_log.{suffix}",
+            mime=mime,
         )
     else:
         st.info("No logs found yet.")
 
+    stage_latency = tracer.percentiles()
+    if not stage_latency.empty:
+        with st.expander("⏱️ Latency by Stage"):
+            st.dataframe(stage_latency.round(1))
+            stage = st.selectbox("Stage", stage_latency.index.tolist(), key="admin_latency_stage")
+            samples = tracer.durations(stage)
+            counts, edges = np.histogram(samples, bins=min(30, max(1, len(samples))))
+            st.bar_chart(pd.DataFrame({"requests": counts}, index=[f"{e:,.1f}" for e in edges[:-1]]), x_label="ms", y_label="requests")
+
+    sheets_stats = get_sheets_pool().stats()
+    if sheets_stats:
+        with st.expander("Google Sheets API latency"):
+            st.dataframe(pd.DataFrame(sheets_stats).T.round(1))
+
     nav1, nav2 = st.columns([1, 1])
     with nav1:
         if st.button("🏠 Home", key="home_admin"):
@@ -528,3 +605,5 @@ elif st.session_state["page"] == "welcome" and st.session_state.get("logged_in")
     with nav2:
         if st.button("🔙 Back", key="back_admin"):
             go_to("welcome")
+
+page_span.end()
@@ -0,0 +1,428 @@
+"""Concurrent-session load test for the Streamlit app.
+
+Drives app.py with streamlit.testing.v1.AppTest from N simulated sessions in one process, so the
+sessions share st.cache_resource objects (catalog, Sheets pool, log writer) as they would on a
+real server. Partner sessions go login -> welcome -> quote_summary -> PDF; every
+`--admin-every`-th session is an admin going through the log filters instead.
+
+Google Sheets is replaced by an in-process FakeWorksheet with configurable latency and 429
+injection. The catalog (with throwaway partner credentials generated for the run), its snapshot,
+the quote log store, write spool and trace file all live in a temporary directory, so the local
+state of a development server is left alone.
+
+Overlapping AppTest runs need two patches to Streamlit internals (see share_server_state), checked
+against STREAMLIT_VERSION; install benchmarks/requirements.txt to get that release.
+
+Reports per-step rerun latency percentiles, reruns/s, peak RSS, fake Sheets call and 429
+counts, and the app's own stage percentiles (catalog.load, fetch_gsheet_log, log_to_sheets,
+pdf.build). Baselines are saved under benchmarks/baselines/ and compared by p95:
+
+    python benchmarks/load_test.py --sessions 40 --concurrency 8 --save-baseline main
+    python benchmarks/load_test.py --sessions 40 --concurrency 8 --compare main
+
+--compare exits with status 1 if a step's p95 grew by more than --tolerance.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(APP_DIR, "app.py")
+BASELINE_DIR = os.path.join(APP_DIR, "benchmarks", "baselines")
+ADMIN_EMAIL = "sdama@redsand.ai"
+# The release share_server_state's patches were written against.
+STREAMLIT_VERSION = "1.65.0"
+STAGES = ["catalog.load", "fetch_gsheet_log", "log_to_sheets", "pdf.build", "page.welcome", "page.quote_summary"]
+
+sys.path.insert(0, APP_DIR)
+
+
+# ---------------- FAKE SHEETS ----------------
+class _QuotaResponse:
+    status_code = 429
+    text = "Quota exceeded"
+
+    def json(self):
+        return {"error": {"code": 429, "message": "Quota exceeded (load test)", "status": "RESOURCE_EXHAUSTED"}}
+
+
+class FakeWorksheet:
+    """Thread-safe in-memory stand-in for the gspread worksheet calls the app makes."""
+
+    def __init__(self, rows=None, latency_ms=50.0, jitter_ms=20.0, error_rate=0.0, seed=0):
+        self.rows = [list(r) for r in rows or []]
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.calls = {}
+        self.throttled = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _call(self, name):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            delay = max(0.0, self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            throttle = self._random.random() < self.error_rate
+            if throttle:
+                self.throttled += 1
+        time.sleep(delay)
+        if throttle:
+            from gspread.exceptions import APIError
+            raise APIError(_QuotaResponse())
+
+    def row_values(self, row):
+        self._call("row_values")
+        with self._lock:
+            return list(self.rows[row - 1]) if len(self.rows) >= row else []
+
+    def append_row(self, values, **kwargs):
+        self._call("append_row")
+        with self._lock:
+            self.rows.append(list(values))
+
+    def append_rows(self, values, **kwargs):
+        self._call("append_rows")
+        with self._lock:
+            self.rows.extend(list(v) for v in values)
+
+    def get_all_values(self):
+        self._call("get_all_values")
+        with self._lock:
+            return [list(r) for r in self.rows]
+
+    def get_values(self, range_name):
+        self._call("get_values")
+        first_row = int(re.match(r"A(\d+)", range_name).group(1))
+        with self._lock:
+            return [list(r) for r in self.rows[first_row - 1:]]
+
+
+class FakeClient:
+    def __init__(self, worksheet):
+        self._worksheet = worksheet
+
+    def open(self, name):
+        return self
+
+    def worksheet(self, name):
+        return self._worksheet
+
+
+def seed_rows(n, partners, seed=0):
+    """Header plus `n` plausible quote log rows for `partners`, (code, name) pairs."""
+    from sheets import LOG_HEADERS
+    rng = random.Random(seed)
+    names = dict(partners)
+    start = datetime(2025, 1, 1)
+    rows = [list(LOG_HEADERS)]
+    for i in range(n):
+        code = rng.choice(list(names))
+        units, price, margin = rng.randint(1, 20), rng.choice([17000, 45000, 210000]), rng.choice([15, 20])
+        customer = units * price
+        values = {
+            "timestamp": (start + timedelta(minutes=7 * i)).isoformat(), "partner_code": code,
+            "partner_name": names[code], "quote_id": uuid.UUID(int=rng.getrandbits(128)).hex[:8],
+            "use_case": "Chat Bot", "configuration": "RedBox One", "gpu_type": "L40S", "units": units,
+            "price_per_unit": price, "customer_monthly": customer, "customer_yearly": customer * 12,
+            "customer_3yr": customer * 36, "margin_monthly": customer * margin / 100,
+            "margin_yearly": customer * margin * 12 / 100, "margin_3yr": customer * margin * 36 / 100,
+            "redsand_monthly": customer * (100 - margin) / 100,
+            "redsand_yearly": customer * (100 - margin) * 12 / 100,
+            "redsand_3yr": customer * (100 - margin) * 36 / 100, "pdf_file": "",
+        }
+        rows.append([str(values[h]) for h in LOG_HEADERS])
+    return rows
+
+
+def make_catalog(workdir, partner_count=3):
+    """Copy the catalog CSVs into `workdir` with throwaway partner credentials.
+
+    Returns (catalog directory, [(code, name, password)]); the passwords exist only for this run
+    and only their hashes are written to disk.
+    """
+    import secrets
+    import pandas as pd
+    from catalog_store import CATALOG_FILES
+    from credentials import hash_password
+
+    catalog_dir = os.path.join(workdir, "catalog")
+    os.makedirs(catalog_dir)
+    for name, (filename, _, _) in CATALOG_FILES.items():
+        if name != "credentials":
+            shutil.copy(os.path.join(APP_DIR, filename), catalog_dir)
+    partners = [(f"LOAD{i + 1:02d}", f"Load Test Partner {i + 1}", secrets.token_urlsafe(12))
+                for i in range(partner_count)]
+    pd.DataFrame({
+        "partner_code": [code for code, _, _ in partners],
+        "partner_name": [name for _, name, _ in partners],
+        "password_hash": [hash_password(password) for _, _, password in partners],
+        "margin_percent": [15 + 5 * (i % 2) for i in range(partner_count)],
+    }).to_csv(os.path.join(catalog_dir, CATALOG_FILES["credentials"][0]), index=False)
+    return catalog_dir, partners
+
+
+def install_fakes(worksheet, workdir, catalog_dir):
+    """Route the app's catalog, Sheets client, log store, spool and traces to the fake and `workdir`."""
+    import catalog_store
+    import log_store
+    import quote_log
+    import sheets
+    import tracing
+
+    sheets.authorize = lambda info: FakeClient(worksheet)
+
+    class LoadTestCatalogStore(catalog_store.CatalogStore):
+        def __init__(self, base_dir=None, snapshot_dir=None, **kwargs):
+            super().__init__(base_dir or catalog_dir, snapshot_dir or os.path.join(workdir, "catalog_snapshot"), **kwargs)
+
+    class LoadTestPool(sheets.SheetsPool):
+        def __init__(self, service_account_info=None):
+            # The app reads st.secrets here, which has no service account in a load test.
+            super().__init__(lambda: {"private_key": "load-test"})
+
+    class LoadTestStore(log_store.QuoteLogStore):
+        def __init__(self, path=None, **kwargs):
+            super().__init__(path or os.path.join(workdir, "quote_log.sqlite"), **kwargs)
+
+    class LoadTestWriter(quote_log.QuoteLogWriter):
+        def __init__(self, open_sheet, spool_path=None, failed_csv=None, **kwargs):
+            super().__init__(open_sheet, spool_path or os.path.join(workdir, "spool.sqlite"),
+                             failed_csv or os.path.join(workdir, "failed_logs.csv"), **kwargs)
+
+    catalog_store.CatalogStore = LoadTestCatalogStore
+    sheets.SheetsPool = LoadTestPool
+    log_store.QuoteLogStore = LoadTestStore
+    quote_log.QuoteLogWriter = LoadTestWriter
+    tracing.tracer.path = os.path.join(workdir, "trace.jsonl")
+
+
+def share_server_state(any_version=False):
+    """Let AppTest runs overlap across threads the way sessions do on a server.
+
+    Each AppTest run installs a mock Runtime as the process-wide singleton and clears it when
+    it finishes, which would pull the runtime out from under any session still running; keep
+    the most recent mock and fall back to it whenever the singleton has been cleared. Each run
+    also compiles app.py into a fresh ScriptCache, and concurrent ast.parse calls can crash on
+    Python 3.11; share one cache, as the server's sessions do.
+
+    Both are private Streamlit internals, so this refuses to run on any release but
+    STREAMLIT_VERSION unless `any_version` is set, and checks the attributes it relies on either way.
+    """
+    import streamlit
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+
+    if streamlit.__version__ != STREAMLIT_VERSION and not any_version:
+        raise SystemExit(f"load_test.py patches Streamlit {STREAMLIT_VERSION} internals but found "
+                         f"{streamlit.__version__}; pip install -r benchmarks/requirements.txt "
+                         f"(or pass --any-streamlit to try anyway)")
+    probe = ScriptCache()
+    if not hasattr(Runtime, "_instance") or not isinstance(getattr(probe, "_cache", None), dict) \
+            or not hasattr(probe, "_lock"):
+        raise SystemExit(f"Streamlit {streamlit.__version__}: Runtime._instance or ScriptCache._cache/_lock "
+                         f"changed; update share_server_state")
+    latest = {}
+
+    def instance(cls):
+        if cls._instance is not None:
+            latest["runtime"] = cls._instance
+            return cls._instance
+        if "runtime" in latest:
+            return latest["runtime"]
+        raise RuntimeError("Runtime hasn't been created!")
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or "runtime" in latest)
+
+    bytecode, lock = {}, threading.Lock()
+
+    def shared_cache(self):
+        self._cache = bytecode
+        self._lock = lock
+
+    ScriptCache.__init__ = shared_cache
+
+
+# ---------------- SESSIONS ----------------
+class Timings:
+    def __init__(self):
+        self.samples = {}
+        self.failures = []
+        self._lock = threading.Lock()
+
+    def run(self, at, step):
+        start = time.perf_counter()
+        at.run()
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.samples.setdefault(step, []).append(elapsed)
+        if at.exception:
+            raise RuntimeError(f"{step}: {at.exception[0].message}")
+
+
+def partner_session(timings, index, seed, partners):
+    from streamlit.testing.v1 import AppTest
+    rng = random.Random(seed + index)
+    code, _, password = partners[index % len(partners)]
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    timings.run(at, "login_page")
+    at.text_input[0].input(code)
+    at.text_input[1].input(password)
+    at.button(key="login_btn").click()
+    timings.run(at, "login")
+    # Distinct user counts, so most quotes miss the PDF cache and build a document.
+    at.number_input(key="welcome_users").set_value(rng.randint(1, 20000))
+    timings.run(at, "welcome")
+    at.button(key="gen_quote").click()
+    timings.run(at, "quote_summary")
+    at.button(key="generate_download_pdf").click()
+    timings.run(at, "pdf")
+    return 1
+
+
+def admin_session(timings, index, seed, partners):
+    from streamlit.testing.v1 import AppTest
+    rng = random.Random(seed + index)
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    timings.run(at, "login_page")
+    at.text_input[0].input(ADMIN_EMAIL)
+    at.button(key="login_btn").click()
+    timings.run(at, "admin")
+    partner_filter = at.selectbox(key="admin_partner_filter")
+    partner_filter.set_value(rng.choice(partner_filter.options[1:] or partner_filter.options))
+    timings.run(at, "admin_filter")
+    at.text_input(key="admin_quote_search").input(format(rng.randrange(16), "x"))
+    timings.run(at, "admin_filter")
+    return 0
+
+
+def percentiles(samples):
+    import numpy as np
+    values = np.asarray(samples, dtype=float)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"count": len(values), "p50_ms": round(p50, 1), "p95_ms": round(p95, 1),
+            "p99_ms": round(p99, 1), "max_ms": round(values.max(), 1)}
+
+
+def run_load_test(args):
+    share_server_state(args.any_streamlit)
+    workdir = tempfile.mkdtemp(prefix="redsand_load_")
+    catalog_dir, partners = make_catalog(workdir)
+    worksheet = FakeWorksheet(seed_rows(args.seed_rows, [(code, name) for code, name, _ in partners], args.seed),
+                              args.latency_ms, args.jitter_ms, args.error_rate, args.seed)
+    install_fakes(worksheet, workdir, catalog_dir)
+    os.chdir(APP_DIR)
+    from tracing import tracer
+
+    timings = Timings()
+    start = time.perf_counter()
+
+    def session(i):
+        flow = admin_session if args.admin_every and i % args.admin_every == args.admin_every - 1 else partner_session
+        try:
+            return flow(timings, i, args.seed, partners)
+        except Exception as e:
+            timings.failures.append(f"session {i}: {e}")
+            return 0
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        quotes = sum(pool.map(session, range(args.sessions)))
+    wall = time.perf_counter() - start
+
+    # Give the background log writer a chance to deliver every quote before counting.
+    expected_rows = args.seed_rows + 1 + quotes
+    deadline = time.monotonic() + args.drain_timeout
+    while len(worksheet.rows) < expected_rows and time.monotonic() < deadline:
+        time.sleep(0.1)
+
+    reruns = sum(len(v) for v in timings.samples.values())
+    stage_table = tracer.percentiles()
+    return {
+        "config": {k: getattr(args, k) for k in ("sessions", "concurrency", "admin_every", "latency_ms",
+                                                 "jitter_ms", "error_rate", "seed_rows", "seed")},
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "wall_s": round(wall, 2),
+        "reruns": reruns,
+        "reruns_per_s": round(reruns / wall, 2),
+        "sessions_per_s": round(args.sessions / wall, 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "steps": {step: percentiles(v) for step, v in sorted(timings.samples.items())},
+        "stages": {name: {k: round(float(v), 1) for k, v in stage_table.loc[name].items()}
+                   for name in STAGES if name in stage_table.index},
+        "sheets": {"calls": dict(sorted(worksheet.calls.items())), "throttled_429": worksheet.throttled,
+                   "quotes_logged": len(worksheet.rows) - args.seed_rows - 1, "quotes_generated": quotes},
+        "failures": timings.failures,
+    }
+
+
+# ---------------- BASELINES ----------------
+def compare(report, baseline, tolerance):
+    """Lines describing p95 changes against `baseline`, and whether any exceeds `tolerance`."""
+    lines, regressed = [], False
+    for section in ("steps", "stages"):
+        for name, now in report[section].items():
+            before = baseline.get(section, {}).get(name)
+            if not before or not before.get("p95_ms"):
+                continue
+            change = now["p95_ms"] / before["p95_ms"] - 1
+            flag = change > tolerance
+            regressed |= flag
+            lines.append(f"{'REGRESSION ' if flag else ''}{section}.{name}: p95 {before['p95_ms']:.1f} -> "
+                         f"{now['p95_ms']:.1f} ms ({change:+.0%})")
+    return lines, regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4, help="sessions running at once")
+    parser.add_argument("--admin-every", type=int, default=5, help="every Nth session is an admin (0: none)")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="mean fake Sheets call latency")
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of Sheets calls that return 429")
+    parser.add_argument("--seed-rows", type=int, default=2000, help="quote log rows already in the fake sheet")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--drain-timeout", type=float, default=30.0, help="seconds to wait for queued log rows")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--save-baseline", metavar="NAME", help="save the report as benchmarks/baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="compare p95s against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p95 growth before --compare fails")
+    parser.add_argument("--any-streamlit", action="store_true", help=f"run on Streamlit releases other than {STREAMLIT_VERSION}")
+    args = parser.parse_args(argv)
+
+    report = run_load_test(args)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(os.path.join(BASELINE_DIR, f"{args.save_baseline}.json"), "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json")) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != report["config"]:
+            print("warning: baseline was recorded with a different configuration", file=sys.stderr)
+        lines, regressed = compare(report, baseline, args.tolerance)
+        print("\n".join(lines), file=sys.stderr)
+        if regressed:
+            sys.exit(1)
+    if report["failures"]:
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
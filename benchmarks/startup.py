@@ -0,0 +1,68 @@
+"""Cold-start benchmark for the Streamlit entry point.
+
+Each sample runs in a fresh interpreter and reports:
+  import_ms        - importing what app.py loads at the top level (streamlit, tracing)
+  first_login_ms   - AppTest render of the login page, including those imports
+  heavy_modules    - heavy dependencies already loaded once the login page has rendered
+
+Usage: python benchmarks/startup.py [--runs 5] [--output startup.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["pandas", "numpy", "altair", "reportlab", "gspread", "google.oauth2"]
+
+SAMPLE = r"""
+import json, sys, time
+start = time.perf_counter()
+import streamlit
+import tracing
+imported = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("app.py", default_timeout=120)
+at.run()
+rendered = time.perf_counter()
+assert not at.exception, at.exception
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "first_login_ms": (rendered - start) * 1000,
+    "heavy_modules": [m for m in %r if m in sys.modules],
+}))
+"""
+
+
+def sample():
+    out = subprocess.run(
+        [sys.executable, "-c", SAMPLE % (HEAVY_MODULES,)],
+        cwd=APP_DIR, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    samples = [sample() for _ in range(args.runs)]
+    report = {
+        "runs": args.runs,
+        "import_ms_median": statistics.median(s["import_ms"] for s in samples),
+        "first_login_ms_median": statistics.median(s["first_login_ms"] for s in samples),
+        "first_login_ms_max": max(s["first_login_ms"] for s in samples),
+        "heavy_modules_after_login": samples[-1]["heavy_modules"],
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import sys
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from io import BytesIO
+
+import pandas as pd
+
+from credentials import load_credentials
+from quote_engine import load_catalog_frames, log_values, quote_batch, scenario_from_request
+from tracing import tracer
+
+# Below this many quotes, starting worker processes costs more than it saves.
+MIN_PARALLEL_QUOTES = 8
+# Render processes the app shares across all sessions; each holds its own reportlab import.
+RENDER_WORKERS = min(4, os.cpu_count() or 1)
+
+
+SCENARIO_FIELDS = ["use_case", "users", "configuration", "units", "partner_margin"]
+NUMERIC_FIELDS = ("users", "units", "partner_margin")
+
+
+def _csv_value(field, value):
+    """A CSV cell as scenario_from_request expects it: blanks become None, numeric fields numbers."""
+    if value is None or value != value:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        if not value:
+            return None
+        if field in NUMERIC_FIELDS:
+            try:
+                return float(value)
+            except ValueError:
+                return value
+    return value
+
+
+def price_scenarios(scenarios, workloads, upgrade_rules, pricing, configs, partner_name, partner_margin,
+                    row_margins=True):
+    """Validate and price a scenarios frame; returns (priced frame, [(CSV line, reason), ...]).
+
+    Every row goes through scenario_from_request, so rows with missing or invalid users, units
+    or margins are rejected rather than priced. Rows without a partner_margin use the partner's
+    default margin; with `row_margins=False` (partner uploads) per-row margins are ignored.
+    """
+    scenarios = pd.DataFrame(scenarios).reset_index(drop=True)
+    use_cases = set(workloads["workload_name"])
+    fields = [col for col in SCENARIO_FIELDS if col in scenarios]
+    if not row_margins and "partner_margin" in fields:
+        fields.remove("partner_margin")
+    valid, accepted, rejected = [], [], []
+    for i, row in enumerate(scenarios[fields].to_dict("records")):
+        item = {field: _csv_value(field, value) for field, value in row.items()}
+        # quote_batch reads a "Manual" use case (as the quote log writes it) as a manual row.
+        item = {field: value for field, value in item.items() if value is not None
+                and not (field == "use_case" and value == "Manual")}
+        try:
+            valid.append(scenario_from_request(item, partner_margin, use_cases))
+        except ValueError as e:
+            rejected.append((i + 2, str(e)))  # line 1 is the header
+            continue
+        accepted.append(i)
+    priced = quote_batch(pd.DataFrame(valid, columns=SCENARIO_FIELDS),
+                         workloads, upgrade_rules, pricing, configs)
+    priced["partner_name"] = partner_name
+    customer = scenarios["customer"].iloc[accepted] if "customer" in scenarios else pd.Series("", index=accepted)
+    priced["customer"] = customer.fillna("").astype(str).to_numpy()
+    priced["quote_id"] = [str(uuid.uuid4())[:8] for _ in range(len(priced))]
+    return priced, rejected
+
+
+def rejected_summary(rejected, limit=5):
+    """One line naming the first `limit` rejected CSV lines and why."""
+    shown = "; ".join(f"line {line}: {reason}" for line, reason in rejected[:limit])
+    more = f"; and {len(rejected) - limit} more" if len(rejected) > limit else ""
+    return f"Skipping {len(rejected)} invalid scenarios ({shown}{more})"
+
+
+def _quote_dicts(priced):
+    quotes = []
+    for row in priced.to_dict("records"):
+        units = row["units"]
+        row["units"] = int(units) if units == units and float(units).is_integer() else units
+        quotes.append(row)
+    return quotes
+
+
+def render_pool(workers=RENDER_WORKERS):
+    """A process pool for render_many; long-lived callers (the app) create one and reuse it."""
+    # spawn: the Streamlit server process has live threads and sockets that fork would copy.
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def render_many(quotes, workers=None, pool=None):
+    """Render one PDF per quote, in parallel across processes for larger packs.
+
+    With `pool` (see render_pool), work goes to that pool's `workers` processes; otherwise a pool
+    is started for this call and shut down after it.
+    """
+    from pdf_quote import render_quote_pdf
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(quotes) < MIN_PARALLEL_QUOTES:
+        return [render_quote_pdf(q) for q in quotes]
+    chunksize = max(1, len(quotes) // (workers * 4))
+    if pool is not None:
+        return list(pool.map(render_quote_pdf, quotes, chunksize=chunksize))
+    with render_pool(workers) as pool:
+        return list(pool.map(render_quote_pdf, quotes, chunksize=chunksize))
+
+
+def render_merged(quotes):
+    """All quotes as one multi-page PDF.
+
+    This is one reportlab document build, so it runs in a single process; only ZIP packs are
+    rendered in parallel.
+    """
+    from reportlab.platypus import SimpleDocTemplate, PageBreak
+    from reportlab.lib.pagesizes import A4
+    from pdf_quote import quote_story
+
+    story = []
+    for i, quote in enumerate(quotes):
+        if i:
+            story.append(PageBreak())
+        story.extend(quote_story(quote))
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=40, leftMargin=40, topMargin=60, bottomMargin=40)
+    with tracer.span("pdf.build_merged", pages=len(quotes)):
+        doc.build(story)
+    return buffer.getvalue()
+
+
+def _pdf_name(i, quote):
+    label = re.sub(r"[^A-Za-z0-9._-]+", "_", quote.get("customer") or quote["quote_id"]).strip("_")
+    return f"{i + 1:04d}_{label or quote['quote_id']}.pdf"
+
+
+def build_quote_pack(priced, fmt="zip", workers=None, pool=None):
+    """Render a priced scenarios frame as a ZIP of PDFs or one merged PDF; returns (bytes, file names).
+
+    ZIP packs are rendered with render_many(quotes, workers, pool).
+    """
+    quotes = _quote_dicts(priced)
+    if fmt == "pdf":
+        return render_merged(quotes), []
+    names = [_pdf_name(i, q) for i, q in enumerate(quotes)]
+    buffer = BytesIO()
+    # PDFs are already compressed; storing them keeps the ZIP step cheap.
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as zf:
+        for name, pdf in zip(names, render_many(quotes, workers, pool)):
+            zf.writestr(name, pdf)
+    return buffer.getvalue(), names
+
+
+def log_rows(priced, partner_code, pack_name, names=None):
+    """Quote log rows for a priced pack, in the same shape as the single-quote log rows."""
+    timestamp = datetime.now().isoformat()
+    rows = []
+    for i, row in enumerate(priced.to_dict("records")):
+        log_row = {
+            "timestamp": timestamp,
+            "partner_code": partner_code,
+            "partner_name": row["partner_name"],
+            "quote_id": row["quote_id"],
+            "use_case": row["use_case"],
+            "configuration": row["configuration"],
+            "gpu_type": row["gpu_type"],
+            **log_values(row["units"], row["price_per_unit"], row),
+            "pdf_file": f"{pack_name}/{names[i]}" if names else pack_name,
+        }
+        rows.append(log_row)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a bulk quote pack from a CSV of scenarios.")
+    parser.add_argument("scenarios", help="CSV with use_case/users or configuration/units; optional partner_margin, customer")
+    parser.add_argument("--partner-code", required=True, help="partner code from partner_credentials.csv")
+    parser.add_argument("-o", "--output", required=True, help="output .zip or .pdf")
+    parser.add_argument("--workers", type=int, default=None, help="render processes (default: all cores)")
+    parser.add_argument("--catalog-dir", default=".", help="directory holding the catalog CSVs")
+    parser.add_argument("--service-account", help="service account JSON; when set, the pack is logged to Google Sheets")
+    parser.add_argument("--spool", help="quote log spool for this run (default: <output>.spool.sqlite)")
+    args = parser.parse_args(argv)
+
+    partners, _ = load_credentials(pd.read_csv(os.path.join(args.catalog_dir, "partner_credentials.csv"),
+                                               dtype={"partner_code": str}))
+    partner = partners.get(args.partner_code)
+    if partner is None:
+        parser.error(f"unknown partner code {args.partner_code}")
+    partner_name, partner_margin = partner.partner_name, partner.margin_percent
+
+    workloads, upgrade_rules, pricing, configs = load_catalog_frames(args.catalog_dir)
+    priced, rejected = price_scenarios(pd.read_csv(args.scenarios, dtype=str, keep_default_na=False), workloads,
+                                       upgrade_rules, pricing, configs, partner_name, partner_margin)
+    if rejected:
+        print(rejected_summary(rejected, limit=len(rejected)), file=sys.stderr)
+    unpriced = priced["price_per_unit"].isna()
+    if unpriced.any():
+        print(f"Skipping {int(unpriced.sum())} scenarios with no price", file=sys.stderr)
+        priced = priced[~unpriced].reset_index(drop=True)
+
+    fmt = "pdf" if args.output.lower().endswith(".pdf") else "zip"
+    pack, names = build_quote_pack(priced, fmt=fmt, workers=args.workers)
+    with open(args.output, "wb") as f:
+        f.write(pack)
+    print(f"Wrote {len(priced)} quotes to {args.output}", file=sys.stderr)
+
+    if args.service_account:
+        from sheets import SheetsPool
+        from quote_log import QuoteLogWriter
+
+        with open(args.service_account) as f:
+            info = json.load(f)
+        # A spool of our own: the app's spool holds other sessions' rows and has its own writer.
+        spool_path = args.spool or f"{args.output}.spool.sqlite"
+        writer = QuoteLogWriter(SheetsPool(lambda: info).log_worksheet, spool_path=spool_path, failed_csv=None)
+        writer.submit_many(log_rows(priced, args.partner_code, os.path.basename(args.output), names),
+                           batch=uuid.uuid4().hex)
+        while writer.flush():
+            pass
+        print(f"Logged {writer.rows_written} quotes, {writer.pending()} still spooled in {spool_path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
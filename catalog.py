@@ -0,0 +1,192 @@
+import re
+
+from credentials import CredentialIndex, load_credentials
+from quote_engine import auto_units, upgrade_ladders
+
+_UNIT_TB = {"PB": 1000.0, "TB": 1.0, "GB": 0.001}
+
+
+# ---------------- SPEC PARSING ----------------
+def parse_gpu_count(spec):
+    """GPU count of a spec like "64 × H200" (0 if unparseable)."""
+    match = re.search(r"(\d+)\s*[×x]", str(spec))
+    return int(match.group(1)) if match else 0
+
+
+def parse_capacity_tb(spec):
+    """Total capacity in TB of a spec like "4 × 3.84TB NVMe + 2 × 16TB SATA SSD" or "2TB DDR5 ECC"."""
+    total = 0.0
+    for term in str(spec).split("+"):
+        match = re.search(r"(?:(\d+)\s*[×x]\s*)?([\d.]+)\s*(PB|TB|GB)", term)
+        if match:
+            total += int(match.group(1) or 1) * float(match.group(2)) * _UNIT_TB[match.group(3)]
+    return total
+
+
+def parse_bandwidth_gbps(spec):
+    """Aggregate link speed of a spec like "4 × 400GbE uplinks + 100Gb Interconnects"."""
+    total = 0.0
+    for term in str(spec).split("+"):
+        match = re.search(r"(?:(\d+)\s*[×x]\s*)?([\d.]+)\s*Gb", term)
+        if match:
+            total += int(match.group(1) or 1) * float(match.group(2))
+    return total
+
+
+def config_key(name):
+    """Normalized configuration name for joining pricing.csv to redbox_configs.csv."""
+    key = re.sub(r"\s+", " ", str(name).replace("×", "x")).strip().casefold()
+    return re.sub(r"\(\s*(.*?)\s*\)", r"(\1)", key)
+
+
+# ---------------- RECORDS ----------------
+class WorkloadSizing:
+    __slots__ = (
+        "workload_name", "gpu_type", "users_per_unit",
+        "storage_gb_per_gpu_base", "storage_gb_per_user",
+    )
+
+    def __init__(self, workload_name, gpu_type, users_per_unit, storage_gb_per_gpu_base=0.0, storage_gb_per_user=0.0):
+        self.workload_name = workload_name
+        self.gpu_type = gpu_type
+        self.users_per_unit = users_per_unit
+        self.storage_gb_per_gpu_base = storage_gb_per_gpu_base
+        self.storage_gb_per_user = storage_gb_per_user
+
+
+class RedBoxConfig:
+    __slots__ = (
+        "configuration_name", "gpu_type", "gpus", "cpus", "ram", "storage", "networking",
+        "gpu_count", "ram_tb", "storage_tb", "network_gbps",
+    )
+
+    def __init__(self, configuration_name, gpu_type, gpus="", cpus="", ram="", storage="", networking=""):
+        self.configuration_name = configuration_name
+        self.gpu_type = gpu_type
+        self.gpus = gpus
+        self.cpus = cpus
+        self.ram = ram
+        self.storage = storage
+        self.networking = networking
+        self.gpu_count = parse_gpu_count(gpus)
+        self.ram_tb = parse_capacity_tb(ram)
+        self.storage_tb = parse_capacity_tb(storage)
+        self.network_gbps = parse_bandwidth_gbps(networking)
+
+
+# ---------------- CATALOG ----------------
+class Catalog:
+    """Read-only lookup tables over the catalog CSVs, built once and shared by every session."""
+
+    def __init__(self, workloads, upgrade_rules, pricing, configs, credentials, gpu_throughput=None):
+        # Raw frames are kept for widgets, tables and the vectorized quote engine.
+        self.workloads = workloads
+        self.upgrade_rules = upgrade_rules
+        self.pricing = pricing
+        self.configs = configs
+        self.credentials = credentials
+        # Set by CatalogStore when it publishes this catalog; part of derived cache keys.
+        self.version = 0
+
+        self.workload_names = list(dict.fromkeys(workloads["workload_name"]))
+        self.config_names = list(dict.fromkeys(configs["configuration_name"]))
+
+        self.sizing_by_workload = {}
+        for row in workloads.itertuples(index=False):
+            if row.workload_name not in self.sizing_by_workload:
+                self.sizing_by_workload[row.workload_name] = WorkloadSizing(
+                    row.workload_name, row.gpu_type, float(row.users_per_unit),
+                    float(getattr(row, "storage_gb_per_gpu_base", 0) or 0),
+                    float(getattr(row, "storage_gb_per_user", 0) or 0),
+                )
+
+        # The same ladders quote_engine.size_auto resolves upgrades with.
+        self.upgrades_by_gpu = upgrade_ladders(upgrade_rules)
+
+        self.configs_by_gpu = {}
+        self.config_by_name = {}
+        for row in configs.itertuples(index=False):
+            record = RedBoxConfig(
+                row.configuration_name, row.gpu_type,
+                getattr(row, "GPUs", ""), getattr(row, "CPUs", ""), getattr(row, "RAM", ""),
+                getattr(row, "Storage", ""), getattr(row, "Networking", ""),
+            )
+            self.config_by_name.setdefault(record.configuration_name, record)
+            self.configs_by_gpu.setdefault(record.gpu_type, []).append(record)
+
+        self.price_by_config = {}
+        for row in pricing.itertuples(index=False):
+            self.price_by_config.setdefault(row.configuration_name, float(row.monthly_price_usd))
+
+        # Relative per-GPU throughput, so sizing can compare configurations across GPU types.
+        self.gpu_throughput = gpu_throughput
+        self.throughput_by_gpu = {}
+        if gpu_throughput is not None:
+            for row in gpu_throughput.itertuples(index=False):
+                if float(row.relative_throughput) > 0:
+                    self.throughput_by_gpu.setdefault(row.gpu_type, float(row.relative_throughput))
+
+        self.comparison = self._comparison_matrix()
+
+        # Malformed credential rows are dropped here and listed in partners.rejected.
+        self.partners = CredentialIndex(*load_credentials(credentials))
+        self.partner_by_code = self.partners.records
+
+    def _comparison_matrix(self):
+        """One row per configuration: specs, parsed capacities, price and unit costs.
+
+        Configurations are matched to pricing rows on `config_key`, so spacing, case or "×"
+        vs "x" differences don't drop a row; configurations without a price keep their specs
+        with empty cost columns, and priced names missing from the configs file are kept too.
+        """
+        import pandas as pd
+
+        price_by_key = {}
+        for name, price in self.price_by_config.items():
+            price_by_key.setdefault(config_key(name), price)
+        rows = {}
+        for record in self.config_by_name.values():
+            price = price_by_key.pop(config_key(record.configuration_name), None)
+            rows[record.configuration_name] = {
+                "GPU Type": record.gpu_type, "GPUs": record.gpus, "CPUs": record.cpus, "RAM": record.ram,
+                "Storage": record.storage, "Networking": record.networking,
+                "Monthly Price (USD)": price, "GPU Count": record.gpu_count or None,
+                "RAM (TB)": record.ram_tb or None, "Storage (TB)": record.storage_tb or None,
+                "Network (Gbps)": record.network_gbps or None,
+            }
+        for name, price in self.price_by_config.items():
+            if config_key(name) in price_by_key:
+                rows[name] = {"Monthly Price (USD)": price}
+        matrix = pd.DataFrame.from_dict(rows, orient="index")
+        matrix.index.name = "configuration_name"
+        matrix["$/GPU-month"] = matrix["Monthly Price (USD)"] / matrix["GPU Count"]
+        matrix["$/TB Storage-month"] = matrix["Monthly Price (USD)"] / matrix["Storage (TB)"]
+        return matrix
+
+    # ---------------- LOOKUPS ----------------
+    def upgrade_gpu(self, gpu, num_users):
+        ladder = self.upgrades_by_gpu.get(gpu)
+        return ladder.resolve(gpu, num_users) if ladder else gpu
+
+    def config_for_gpu(self, gpu):
+        matches = self.configs_by_gpu.get(gpu)
+        return matches[0].configuration_name if matches else "Unknown"
+
+    def gpu_for_config(self, configuration_name):
+        record = self.config_by_name.get(configuration_name)
+        return record.gpu_type if record else "Unknown"
+
+    def price(self, configuration_name):
+        """Monthly price per unit, or None if the configuration isn't priced."""
+        return self.price_by_config.get(configuration_name)
+
+    def auto_size(self, use_case, num_users):
+        """Auto mode: (units, gpu_type, configuration) for a use case and user count."""
+        sizing = self.sizing_by_workload[use_case]
+        units = int(auto_units(num_users, sizing.users_per_unit))
+        gpu = self.upgrade_gpu(sizing.gpu_type, num_users)
+        return units, gpu, self.config_for_gpu(gpu)
+
+    def authenticate(self, partner_code, password):
+        """Partner record for valid credentials, else None."""
+        return self.partners.authenticate(partner_code, password)
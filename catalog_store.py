@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+from catalog import Catalog
+from local_state import STATE_DIR, private_dir
+from tracing import tracer
+
+# Parsed frames are cached here as Arrow (Feather) files: data only, never unpickled code, and
+# the Catalog is always rebuilt by the running code. The directory must be private (0700) because
+# the credentials frame holds password hashes.
+SNAPSHOT_DIR = os.path.join(STATE_DIR, "catalog")
+# Bump when read_catalog_file changes what it produces, so older snapshots are ignored.
+SNAPSHOT_FORMAT = 1
+LEGACY_SNAPSHOT_PATH = "/tmp/redsand_catalog.pickle"
+
+# Catalog files in Catalog() argument order: name -> (file, required columns, numeric columns).
+CATALOG_FILES = {
+    "workloads": ("workloads.csv", ["workload_name", "gpu_type", "users_per_unit"], ["users_per_unit"]),
+    "upgrade_rules": ("gpu_upgrade_rules.csv", ["current_gpu", "upgrade_gpu", "user_threshold"], ["user_threshold"]),
+    "pricing": ("pricing.csv", ["configuration_name", "monthly_price_usd"], ["monthly_price_usd"]),
+    "configs": ("redbox_configs.csv", ["configuration_name", "gpu_type"], []),
+    "credentials": ("partner_credentials.csv", ["partner_code", "partner_name"], []),
+    "gpu_throughput": ("gpu_throughput.csv", ["gpu_type", "relative_throughput"], ["relative_throughput"]),
+}
+
+
+def read_catalog_file(path, required, numeric):
+    """Parse and validate one catalog CSV; raises ValueError if it can't back a catalog."""
+    frame = pd.read_csv(path, dtype={"partner_code": str})
+    missing = [col for col in required if col not in frame.columns]
+    if missing:
+        raise ValueError(f"{os.path.basename(path)}: missing columns {missing}")
+    if frame.empty:
+        raise ValueError(f"{os.path.basename(path)}: no rows")
+    for col in numeric:
+        values = pd.to_numeric(frame[col], errors="coerce")
+        if values.isna().any():
+            raise ValueError(f"{os.path.basename(path)}: non-numeric {col} on line(s) "
+                             f"{[i + 2 for i in values.index[values.isna()]]}")
+        frame[col] = values
+    if "margin_percent" in frame.columns:
+        frame["margin_percent"] = pd.to_numeric(frame["margin_percent"], errors="coerce").fillna(0)
+    return frame
+
+
+def _file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class CatalogStore:
+    """Catalog built from the CSVs in `base_dir`, reloaded when one of them changes.
+
+    `current()` stats the files at most every `check_interval` seconds. A file whose mtime or
+    size moved is hashed, and only if its content changed is it re-parsed and validated; the
+    other frames are reused. The new Catalog replaces the old one in a single assignment, so a
+    session holding the previous snapshot keeps a consistent view until its next rerun. A file
+    that fails validation is reported in `last_error` and the last good snapshot stays live.
+
+    The validated frames are saved as Feather files in `snapshot_dir` (None disables this),
+    named by the hash of the CSV they came from, so a cold start whose CSVs are unchanged reads
+    Arrow instead of parsing CSV.
+    """
+
+    def __init__(self, base_dir=".", snapshot_dir=SNAPSHOT_DIR, check_interval=1.0):
+        self.base_dir = base_dir
+        self.snapshot_dir = snapshot_dir
+        self.check_interval = check_interval
+        self.version = 0
+        self.last_error = None
+        self._stats = {}
+        self._hashes = {}
+        self._catalog = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _path(self, name):
+        return os.path.join(self.base_dir, CATALOG_FILES[name][0])
+
+    def _stat(self, name):
+        st = os.stat(self._path(name))
+        return st.st_mtime_ns, st.st_size
+
+    # ---------------- LOADING ----------------
+    def current(self):
+        """The live Catalog; checks the source files first if `check_interval` has passed."""
+        if self._catalog is None or time.monotonic() - self._checked_at >= self.check_interval:
+            with self._lock:
+                if self._catalog is None:
+                    self._load()
+                elif time.monotonic() - self._checked_at >= self.check_interval:
+                    self._reload_changed()
+                self._checked_at = time.monotonic()
+        return self._catalog
+
+    def _load(self):
+        with tracer.span("catalog.load") as span:
+            stats = {name: self._stat(name) for name in CATALOG_FILES}
+            hashes = {name: _file_hash(self._path(name)) for name in CATALOG_FILES}
+            frames = self._read_snapshot(hashes)
+            span.attrs["snapshot"] = frames is not None
+            if frames is None:
+                frames = {name: read_catalog_file(self._path(name), *spec[1:]) for name, spec in CATALOG_FILES.items()}
+                self._write_snapshot(hashes, frames)
+            catalog = Catalog(**frames)
+            self._stats, self._hashes = stats, hashes
+            self._swap(catalog)
+
+    def _reload_changed(self):
+        try:
+            stats = {name: self._stat(name) for name in CATALOG_FILES}
+        except OSError as e:
+            self.last_error = str(e)
+            return
+        moved = [name for name in CATALOG_FILES if stats[name] != self._stats.get(name)]
+        if not moved:
+            return
+        hashes = dict(self._hashes)
+        changed = []
+        for name in moved:
+            hashes[name] = _file_hash(self._path(name))
+            if hashes[name] != self._hashes.get(name):
+                changed.append(name)
+        if not changed:
+            self._stats = stats
+            return
+
+        with tracer.span("catalog.reload", files=",".join(changed)):
+            frames = {name: getattr(self._catalog, name) for name in CATALOG_FILES}
+            try:
+                for name in changed:
+                    frames[name] = read_catalog_file(self._path(name), *CATALOG_FILES[name][1:])
+                catalog = Catalog(**frames)
+            except Exception as e:
+                # Keep serving the last good catalog; retry once the file changes again.
+                self.last_error = f"{type(e).__name__}: {e}"
+                tracer.log("catalog reload failed", files=",".join(changed), error=self.last_error)
+                self._stats = stats
+                return
+            self._stats, self._hashes = stats, hashes
+            self._write_snapshot(hashes, frames)
+            self._swap(catalog)
+
+    def _swap(self, catalog):
+        self.version += 1
+        catalog.version = self.version
+        self.last_error = None
+        self._catalog = catalog
+
+    # ---------------- SNAPSHOT ----------------
+    def _private_dir(self):
+        """The snapshot directory if it is ours and closed to other users, else None."""
+        return private_dir(self.snapshot_dir) if self.snapshot_dir else None
+
+    def _frame_path(self, directory, name, file_hash):
+        return os.path.join(directory, f"{name}-{file_hash[:16]}.feather")
+
+    def _read_snapshot(self, hashes):
+        directory = self._private_dir()
+        if directory is None:
+            return None
+        try:
+            with open(os.path.join(directory, "manifest.json")) as f:
+                manifest = json.load(f)
+            if manifest.get("format") != SNAPSHOT_FORMAT or manifest.get("hashes") != hashes:
+                return None
+            return {name: pd.read_feather(self._frame_path(directory, name, hashes[name])) for name in CATALOG_FILES}
+        except Exception:
+            return None
+
+    def _write_snapshot(self, hashes, frames):
+        directory = self._private_dir()
+        if directory is None:
+            return
+        try:
+            keep = {"manifest.json"}
+            for name, frame in frames.items():
+                path = self._frame_path(directory, name, hashes[name])
+                keep.add(os.path.basename(path))
+                if not os.path.exists(path):
+                    self._write_private(directory, path, frame.to_feather)
+            self._write_private(directory, os.path.join(directory, "manifest.json"),
+                                lambda f: f.write(json.dumps({"format": SNAPSHOT_FORMAT, "hashes": hashes}).encode()))
+            for entry in os.listdir(directory):
+                if entry.endswith(".feather") and entry not in keep:
+                    os.remove(os.path.join(directory, entry))
+            # Older versions left a world-readable pickle, password hashes included, in /tmp.
+            if os.path.exists(LEGACY_SNAPSHOT_PATH) and os.stat(LEGACY_SNAPSHOT_PATH).st_uid == os.getuid():
+                os.remove(LEGACY_SNAPSHOT_PATH)
+        except Exception:
+            pass  # The snapshot only speeds up cold starts
+
+    @staticmethod
+    def _write_private(directory, path, write):
+        # mkstemp creates the file 0600; the rename makes it appear whole or not at all.
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
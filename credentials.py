@@ -0,0 +1,188 @@
+"""Partner credential index: salted PBKDF2 password hashes keyed by partner code.
+
+partner_credentials.csv stores `password_hash` values made by `hash_password`. A legacy
+plaintext `password` column is still accepted and hashed at load; convert the file once with
+
+    python credentials.py partner_credentials.csv
+
+so plaintext passwords no longer sit on disk.
+"""
+import argparse
+import hashlib
+import hmac
+import os
+import secrets
+
+HASH_SCHEME = "pbkdf2_sha256"
+HASH_ITERATIONS = 200_000
+
+
+# ---------------- HASHING ----------------
+def hash_password(password, salt=None, iterations=HASH_ITERATIONS):
+    """Encode a password as "pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>"."""
+    salt = salt or secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"{HASH_SCHEME}${iterations}${salt.hex()}${digest.hex()}"
+
+
+def parse_password_hash(encoded):
+    """(iterations, salt, digest) of an encoded hash; raises ValueError if malformed."""
+    parts = str(encoded).split("$")
+    if len(parts) != 4:
+        raise ValueError("malformed password hash")
+    scheme, iterations, salt, digest = parts
+    if scheme != HASH_SCHEME or int(iterations) < 1:
+        raise ValueError(f"unsupported password hash {scheme!r}")
+    return int(iterations), bytes.fromhex(salt), bytes.fromhex(digest)
+
+
+def verify_password(password, encoded):
+    iterations, salt, digest = parse_password_hash(encoded)
+    candidate = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return hmac.compare_digest(candidate, digest)
+
+
+# ---------------- RECORDS ----------------
+class PartnerRecord:
+    __slots__ = ("partner_code", "partner_name", "password_hash", "margin_percent")
+
+    def __init__(self, partner_code, partner_name, password_hash, margin_percent=0.0):
+        self.partner_code = partner_code
+        self.partner_name = partner_name
+        self.password_hash = password_hash
+        self.margin_percent = margin_percent
+
+
+def _blank(value):
+    return value is None or value != value or str(value).strip() == ""
+
+
+def load_credentials(frame):
+    """Build partner records from a credentials frame; returns (records by code, rejected rows).
+
+    Rows with a missing code or name, a duplicate code, no password, a malformed hash or a
+    margin outside [0, 100) are rejected with a reason rather than failing at login time.
+    """
+    has_hash = "password_hash" in frame.columns
+    has_plain = "password" in frame.columns
+    if not has_hash and not has_plain:
+        raise ValueError("partner_credentials.csv: needs a password_hash (or legacy password) column")
+
+    records, rejected = {}, []
+    for line, row in enumerate(frame.to_dict("records"), start=2):
+        code = "" if _blank(row.get("partner_code")) else str(row["partner_code"]).strip()
+        try:
+            if not code:
+                raise ValueError("missing partner_code")
+            if code in records:
+                raise ValueError(f"duplicate partner_code {code}")
+            if _blank(row.get("partner_name")):
+                raise ValueError("missing partner_name")
+            margin = row.get("margin_percent", 0)
+            margin = 0.0 if _blank(margin) else float(margin)
+            if not 0 <= margin < 100:
+                raise ValueError(f"margin_percent {margin} outside [0, 100)")
+            if has_hash and not _blank(row.get("password_hash")):
+                password_hash = str(row["password_hash"]).strip()
+                parse_password_hash(password_hash)
+            elif has_plain and not _blank(row.get("password")):
+                password_hash = hash_password(str(row["password"]))
+            else:
+                raise ValueError("missing password")
+        except ValueError as e:
+            rejected.append((line, code, str(e)))
+            continue
+        records[code] = PartnerRecord(code, str(row["partner_name"]), password_hash, margin)
+    return records, rejected
+
+
+# ---------------- INDEX ----------------
+class CredentialIndex:
+    """Partner records by code, with an in-process cache of verified passwords.
+
+    A successful login remembers an HMAC of the password under a per-process key, so later
+    logins for the same partner cost one dict lookup and one HMAC instead of a PBKDF2 run.
+    The cache is not pickled and starts empty whenever the credentials file is reloaded.
+    """
+
+    def __init__(self, records, rejected=()):
+        self.records = records
+        self.rejected = list(rejected)
+        self._init_cache()
+
+    def _init_cache(self):
+        self._session_key = secrets.token_bytes(32)
+        self._verified = {}
+        self._dummy_hash = None
+
+    def __getstate__(self):
+        return {"records": self.records, "rejected": self.rejected}
+
+    def __setstate__(self, state):
+        self.records = state["records"]
+        self.rejected = state["rejected"]
+        self._init_cache()
+
+    def __len__(self):
+        return len(self.records)
+
+    def get(self, partner_code):
+        return self.records.get(str(partner_code))
+
+    def authenticate(self, partner_code, password):
+        """Partner record for valid credentials, else None."""
+        record = self.records.get(str(partner_code))
+        if record is None:
+            # Unknown codes still pay for one hash check, so response time doesn't reveal valid codes.
+            if self._dummy_hash is None:
+                self._dummy_hash = hash_password(secrets.token_hex(8))
+            verify_password(str(password), self._dummy_hash)
+            return None
+        if self.authenticate_cached(partner_code, password) is not None:
+            return record
+        if not verify_password(str(password), record.password_hash):
+            return None
+        self._verified[record.partner_code] = self._token(record, password)
+        return record
+
+    def authenticate_cached(self, partner_code, password):
+        """Partner record if these credentials were already verified in this process, else None.
+
+        Never runs PBKDF2, so it is cheap enough for an event loop; a None means "unknown", and
+        `authenticate` has to decide.
+        """
+        record = self.records.get(str(partner_code))
+        if record is None:
+            return None
+        cached = self._verified.get(record.partner_code)
+        if cached is not None and hmac.compare_digest(cached, self._token(record, password)):
+            return record
+        return None
+
+    def _token(self, record, password):
+        return hmac.new(self._session_key, f"{record.partner_code}\0{password}".encode("utf-8"), "sha256").digest()
+
+
+def main(argv=None):
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Replace plaintext partner passwords with salted hashes.")
+    parser.add_argument("csv", nargs="?", default="partner_credentials.csv")
+    args = parser.parse_args(argv)
+
+    frame = pd.read_csv(args.csv, dtype=str, keep_default_na=False)
+    if "password" not in frame.columns:
+        parser.exit(message=f"{args.csv} has no plaintext password column\n")
+    if "password_hash" not in frame.columns:
+        frame.insert(frame.columns.get_loc("password"), "password_hash", "")
+    plain = frame["password"].str.strip() != ""
+    frame.loc[plain, "password_hash"] = frame.loc[plain, "password"].map(hash_password)
+    frame = frame.drop(columns="password")
+    tmp_path = f"{args.csv}.tmp"
+    frame.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, args.csv)
+    print(f"Hashed {int(plain.sum())} passwords in {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
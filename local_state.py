@@ -0,0 +1,46 @@
+"""The app's private local state directory.
+
+The catalog snapshot (partner password hashes), the quote log spool and the quote log mirror
+(every partner's quoted prices) live here, in a 0700 directory under the user's cache directory,
+instead of at fixed paths in /tmp that any local user can read or pre-create.
+"""
+import os
+import stat
+
+STATE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "redsand")
+
+
+def private_dir(path):
+    """Create `path` (0700) if needed; returns it if it is ours and closed to other users, else None."""
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        st = os.lstat(path)
+    except OSError:
+        return None
+    # Writable by others, it may already hold planted files, so it is never trusted.
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o022:
+        return None
+    if st.st_mode & 0o077:
+        # Ours but readable by others (e.g. made as a parent by makedirs, which ignores `mode`
+        # for parents): close it rather than give up.
+        try:
+            os.chmod(path, 0o700)
+        except OSError:
+            return None
+    return path
+
+
+def state_path(name):
+    """Path of `name` in STATE_DIR; raises PermissionError if the directory isn't private."""
+    if private_dir(STATE_DIR) is None:
+        raise PermissionError(f"{STATE_DIR} must be a directory owned by this user and writable only by it")
+    return os.path.join(STATE_DIR, name)
+
+
+def is_own_file(path):
+    """True if `path` is a regular file owned by this user that no one else can write."""
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISREG(st.st_mode) and st.st_uid == os.getuid() and not st.st_mode & 0o022
@@ -0,0 +1,91 @@
+import gzip
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+EXPORT_FORMATS = {
+    "CSV (gzip)": ("csv.gz", "application/gzip"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+
+def write_csv_gz(view, positions, path, chunk_rows):
+    with gzip.open(path, "wt", encoding="utf-8", newline="", compresslevel=6) as f:
+        if not len(positions):
+            view.rows(positions).to_csv(f, index=False)
+        for start in range(0, len(positions), chunk_rows):
+            view.rows(positions[start:start + chunk_rows]).to_csv(f, index=False, header=start == 0)
+
+
+def write_parquet(view, positions, path, chunk_rows):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Categorical label columns become plain strings, so every chunk shares one schema.
+    schema = pa.Schema.from_pandas(_plain(view.rows(positions[:0])), preserve_index=False)
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for start in range(0, len(positions), chunk_rows):
+            chunk = _plain(view.rows(positions[start:start + chunk_rows]))
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def _plain(frame):
+    categorical = [col for col in frame.columns if frame[col].dtype == "category"]
+    return frame.astype({col: str for col in categorical}) if categorical else frame
+
+
+class LogExporter:
+    """On-demand exports of filtered quote log slices, cached as compressed temp files.
+
+    Each export is written `chunk_rows` rows at a time, so the whole slice never exists as one
+    serialized string. Files are keyed by the log view version plus the filter tuple and
+    format; the least recently used ones are deleted beyond `max_entries`.
+    """
+
+    def __init__(self, max_entries=8, chunk_rows=50_000, directory=None):
+        self.max_entries = max_entries
+        self.chunk_rows = chunk_rows
+        self.directory = directory or tempfile.mkdtemp(prefix="redsand_export_")
+        self.hits = 0
+        self.misses = 0
+        self._files = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def path(self, view, positions, key, fmt):
+        """Path of the export file for `key`, writing it first if it isn't cached."""
+        key = (view.version, fmt) + tuple(key)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # One writer per key: a double click waits for the first export instead of repeating it.
+        with key_lock:
+            with self._lock:
+                if key in self._files and os.path.exists(self._files[key]):
+                    self._files.move_to_end(key)
+                    self.hits += 1
+                    return self._files[key]
+            suffix, _ = EXPORT_FORMATS[fmt]
+            fd, path = tempfile.mkstemp(suffix=f".{suffix}", dir=self.directory)
+            os.close(fd)
+            try:
+                (write_parquet if suffix == "parquet" else write_csv_gz)(view, positions, path, self.chunk_rows)
+            except Exception:
+                os.remove(path)
+                raise
+            with self._lock:
+                self.misses += 1
+                self._files[key] = path
+                while len(self._files) > self.max_entries:
+                    old_key, old_path = self._files.popitem(last=False)
+                    self._key_locks.pop(old_key, None)
+                    try:
+                        os.remove(old_path)
+                    except OSError:
+                        pass
+            return path
+
+    def export(self, view, positions, key, fmt):
+        """Compressed bytes of the export, for st.download_button's deferred `data` callable."""
+        with open(self.path(view, positions, key, fmt), "rb") as f:
+            return f.read()
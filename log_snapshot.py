@@ -0,0 +1,86 @@
+import threading
+
+import numpy as np
+
+
+class QuoteLogSnapshot:
+    """Immutable Arrow copy of the quote log, shared by every session for one store version.
+
+    Rows are ordered by partner code and then newest first, and `ranges` maps each partner code
+    to its (offset, length) run, so a partner's history is a zero-copy `Table.slice` rather than
+    a query and a private DataFrame per session and rerun.
+    """
+
+    def __init__(self, table, version=None):
+        self.table = table
+        self.version = version
+        codes = table.column("partner_code").to_numpy(zero_copy_only=False) if table.num_rows else np.array([])
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.array([], dtype=int)
+        ends = np.r_[starts[1:], len(codes)]
+        self.ranges = {codes[s]: (int(s), int(e - s)) for s, e in zip(starts, ends)}
+
+    @classmethod
+    def from_store(cls, store, version=None):
+        # Arrow's sort is stable and much faster than ordering the rows in SQLite.
+        table = store.arrow_table().sort_by([("partner_code", "ascending"), ("timestamp", "descending")])
+        return cls(table, version)
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def partner_rows(self, partner_code):
+        """The partner's rows, newest first, as a view into the shared table."""
+        offset, length = self.ranges.get(str(partner_code), (0, 0))
+        return self.table.slice(offset, length)
+
+
+class SnapshotPublisher:
+    """Latest object built by `build(source)`, rebuilt on a background thread when `key` changes.
+
+    `get` returns whatever was published last and, if `key` is newer, starts a rebuild; readers
+    keep the previous object until the new one is swapped in with a single assignment. Only
+    the first `get`, with nothing published yet, waits for a build.
+    """
+
+    def __init__(self, build, name="snapshot-publisher"):
+        self.build = build
+        self.name = name
+        self.key = None
+        self.value = None
+        self.last_error = None
+        self._wanted = None
+        self._building = False
+        self._cond = threading.Condition()
+
+    def get(self, key, source):
+        with self._cond:
+            if self.value is None or self.key != key:
+                self._wanted = (key, source)
+                if not self._building:
+                    self._building = True
+                    self.last_error = None
+                    threading.Thread(target=self._run, name=self.name, daemon=True).start()
+            while self.value is None:
+                if self.last_error is not None and not self._building:
+                    raise self.last_error
+                self._cond.wait()
+            return self.value
+
+    def _run(self):
+        while True:
+            with self._cond:
+                key, source = self._wanted
+                if self.value is not None and self.key == key:
+                    self._building = False
+                    return
+            try:
+                value = self.build(source)
+            except Exception as e:
+                with self._cond:
+                    self.last_error = e
+                    self._building = False
+                    self._cond.notify_all()
+                return
+            with self._cond:
+                self.key, self.value = key, value
+                self._cond.notify_all()
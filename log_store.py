@@ -0,0 +1,117 @@
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+from gspread.utils import rowcol_to_a1
+
+from local_state import STATE_DIR, is_own_file, state_path
+from sheets import LOG_HEADERS
+
+# Every partner's quoted prices: kept in the private state directory, not readable by other users.
+STORE_PATH = os.path.join(STATE_DIR, "quote_log.sqlite")
+LEGACY_STORE_PATH = "/tmp/redsand_quote_log.sqlite"
+
+
+class QuoteLogStore:
+    """Local SQLite mirror of the quote log sheet.
+
+    The sheet is append-only, so after the first full download `sync` only fetches the rows below
+    the last one already stored. Reads (`arrow_table`, `rows_after`) never touch the network; both
+    scan in row_num order, so the table needs no secondary indexes.
+    """
+
+    def __init__(self, path=STORE_PATH, full_resync_interval=3600):
+        self.path = path
+        self.full_resync_interval = full_resync_interval
+        self.last_sync = 0.0
+        # Bumped whenever the stored rows change, so derived views know when to rebuild.
+        self.version = 0
+        # Bumped on every full resync, when previously stored rows may have changed or vanished.
+        self.generation = 0
+        self._lock = threading.Lock()
+        if path == STORE_PATH:
+            state_path(os.path.basename(STORE_PATH))  # creates the private directory, or refuses
+            # Older versions mirrored the log to a world-readable /tmp file; it is only a cache.
+            for suffix in ("", "-journal", "-wal", "-shm"):
+                if is_own_file(LEGACY_STORE_PATH + suffix):
+                    os.remove(LEGACY_STORE_PATH + suffix)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        columns = ", ".join(f'"{h}" TEXT' for h in LOG_HEADERS)
+        with self._db:
+            self._db.execute(f"CREATE TABLE IF NOT EXISTS quotes (row_num INTEGER PRIMARY KEY, {columns})")
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            # Left by older versions; nothing reads through them, and they slow every sync down.
+            for index in ("idx_quotes_partner", "idx_quotes_quote_id", "idx_quotes_timestamp"):
+                self._db.execute(f"DROP INDEX IF EXISTS {index}")
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'last_full_sync'").fetchone()
+        self.last_full_sync = float(row[0]) if row else 0.0
+
+    # ---------------- SYNC ----------------
+    def _headers(self):
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'headers'").fetchone()
+        return row[0].split("\t") if row else None
+
+    def sync(self, sheet, full=False):
+        """Pull new sheet rows into the store; returns the number of rows added."""
+        with self._lock:
+            headers = self._headers()
+            last_row = self._db.execute("SELECT MAX(row_num) FROM quotes").fetchone()[0]
+            full = full or headers is None or last_row is None
+        if full:
+            values = sheet.get_all_values()
+            headers, rows, first_row = (values[0] if values else list(LOG_HEADERS)), values[1:], 2
+        else:
+            first_row = last_row + 1
+            last_col = rowcol_to_a1(1, len(headers)).rstrip("0123456789")
+            rows = sheet.get_values(f"A{first_row}:{last_col}")
+
+        positions = [headers.index(h) if h in headers else None for h in LOG_HEADERS]
+        records = [
+            [first_row + i] + [(row[p] if p is not None and p < len(row) else "") for p in positions]
+            for i, row in enumerate(rows)
+            if any(cell != "" for cell in row)
+        ]
+        placeholders = ", ".join("?" * (len(LOG_HEADERS) + 1))
+        with self._lock, self._db:
+            if full:
+                self._db.execute("DELETE FROM quotes")
+                self.last_full_sync = time.time()
+                self._db.execute("INSERT OR REPLACE INTO meta VALUES ('headers', ?)", ("\t".join(headers),))
+                self._db.execute("INSERT OR REPLACE INTO meta VALUES ('last_full_sync', ?)", (str(self.last_full_sync),))
+            self._db.executemany(f"INSERT OR REPLACE INTO quotes VALUES ({placeholders})", records)
+        if full:
+            self.generation += 1
+        if full or records:
+            self.version += 1
+        self.last_sync = time.time()
+        return len(records)
+
+    def sync_if_stale(self, open_sheet, max_age=60):
+        """Sync at most once per `max_age` seconds; `open_sheet` is only called when syncing."""
+        now = time.time()
+        if now - self.last_sync < max_age:
+            return 0
+        # Mark the attempt up front so a failing sheet isn't retried on every rerun.
+        self.last_sync = now
+        full = now - self.last_full_sync > self.full_resync_interval
+        return self.sync(open_sheet(), full=full)
+
+    # ---------------- QUERIES ----------------
+    def arrow_table(self):
+        """All stored rows as a pyarrow Table of string columns, in sheet order."""
+        import pyarrow as pa
+        columns = ", ".join(f'"{h}"' for h in LOG_HEADERS)
+        with self._lock:
+            rows = self._db.execute(f"SELECT {columns} FROM quotes ORDER BY row_num").fetchall()
+        values = list(zip(*rows)) if rows else [()] * len(LOG_HEADERS)
+        return pa.table({h: pa.array(col, type=pa.string()) for h, col in zip(LOG_HEADERS, values)})
+
+    def rows_after(self, row_num):
+        """Rows stored below sheet row `row_num`, with their `row_num`, in sheet order."""
+        columns = ", ".join(f'"{h}"' for h in LOG_HEADERS)
+        with self._lock:
+            return pd.read_sql_query(
+                f"SELECT row_num, {columns} FROM quotes WHERE row_num > ? ORDER BY row_num", self._db, params=[row_num]
+            )
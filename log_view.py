@@ -0,0 +1,103 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from quote_engine import MONEY_COLUMNS
+
+NUMERIC_COLUMNS = ["units", "price_per_unit"] + MONEY_COLUMNS
+CATEGORY_COLUMNS = ["partner_code", "partner_name", "use_case", "configuration", "gpu_type"]
+
+
+def typed_log(raw):
+    """Quote log with parsed timestamps, float money columns and categorical labels."""
+    log = raw.copy()
+    log["timestamp"] = pd.to_datetime(log["timestamp"], errors="coerce", format="ISO8601")
+    for col in NUMERIC_COLUMNS:
+        if col in log:
+            log[col] = pd.to_numeric(log[col], errors="coerce")
+    for col in CATEGORY_COLUMNS:
+        if col in log:
+            log[col] = log[col].astype("category")
+    return log
+
+
+class QuoteLogView:
+    """Read-only typed quote log with indexes for the admin filters.
+
+    Built once per sync. Filters return row positions (newest first) so only the requested page is
+    ever materialized as a DataFrame.
+    """
+
+    def __init__(self, raw, version=None):
+        self.version = version
+        self.log = typed_log(raw).reset_index(drop=True)
+        ts = self.log["timestamp"].to_numpy(dtype="datetime64[ns]")
+
+        # Sorted timestamp index; NumPy sorts NaT last, and those rows are excluded from date ranges.
+        self._by_time = np.argsort(ts, kind="stable")
+        self._ts_sorted = ts[self._by_time]
+        self._n_valid = len(ts) - int(np.isnat(ts).sum())
+        self._newest_first = np.concatenate([self._by_time[:self._n_valid][::-1], self._by_time[self._n_valid:]])
+
+        # Prefix index over lower-cased quote IDs.
+        ids = self.log["quote_id"].astype(str).str.lower().to_numpy(dtype=object)
+        self._by_id = np.argsort(ids, kind="stable")
+        self._ids_sorted = ids[self._by_id].astype(str)
+
+        self._by_partner = {
+            name: np.asarray(pos) for name, pos in self.log.groupby("partner_name", observed=True).indices.items()
+        }
+
+    def __len__(self):
+        return len(self.log)
+
+    # ---------------- SUMMARY ----------------
+    @property
+    def partner_names(self):
+        return sorted(self._by_partner)
+
+    @property
+    def min_timestamp(self):
+        return pd.Timestamp(self._ts_sorted[0]) if self._n_valid else None
+
+    @property
+    def max_timestamp(self):
+        return pd.Timestamp(self._ts_sorted[self._n_valid - 1]) if self._n_valid else None
+
+    # ---------------- FILTERS ----------------
+    def date_positions(self, start_date, end_date):
+        valid = self._ts_sorted[:self._n_valid]
+        lo = np.searchsorted(valid, np.datetime64(pd.Timestamp(start_date)), "left")
+        hi = np.searchsorted(valid, np.datetime64(pd.Timestamp(end_date) + timedelta(days=1)), "left")
+        return self._by_time[lo:hi]
+
+    def quote_id_positions(self, prefix):
+        prefix = prefix.strip().lower()
+        lo = np.searchsorted(self._ids_sorted, prefix, "left")
+        hi = np.searchsorted(self._ids_sorted, prefix + "\uffff", "left")
+        return self._by_id[lo:hi]
+
+    def filter(self, partner_name=None, start_date=None, end_date=None, quote_id_prefix=None):
+        """Row positions matching every given filter, newest first."""
+        keep = np.ones(len(self.log), dtype=bool)
+        if partner_name is not None:
+            mask = np.zeros(len(self.log), dtype=bool)
+            mask[self._by_partner.get(partner_name, [])] = True
+            keep &= mask
+        if start_date is not None and end_date is not None:
+            mask = np.zeros(len(self.log), dtype=bool)
+            mask[self.date_positions(start_date, end_date)] = True
+            keep &= mask
+        if quote_id_prefix and quote_id_prefix.strip():
+            mask = np.zeros(len(self.log), dtype=bool)
+            mask[self.quote_id_positions(quote_id_prefix)] = True
+            keep &= mask
+        return self._newest_first[keep[self._newest_first]]
+
+    def rows(self, positions):
+        return self.log.iloc[positions]
+
+    def page(self, positions, page_number, page_size):
+        start = max(0, (page_number - 1) * page_size)
+        return self.log.iloc[positions[start:start + page_size]]
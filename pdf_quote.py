@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from io import BytesIO
+
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+
+from tracing import tracer
+
+LOGO_PATH = "Redsand Logo_White.png"
+
+DISCLAIMER = ("<b>Disclaimer:</b> The pricing provided in this summary is indicative only. "
+              "Final pricing will vary based on the actual configuration including RAM, storage, special hardware features, "
+              "service-level agreements, hardware availability, and customer-specific requirements. "
+              "Please contact Redsand at <b>hello@redsand.ai</b> for an official quote or custom configuration.")
+
+# Fields of a quote that change the rendered document; also the PDF cache key.
+PDF_FIELDS = [
+    "use_case", "gpu_type", "configuration", "units", "partner_name", "partner_margin",
+    "redsand_monthly", "redsand_yearly", "redsand_3yr",
+    "margin_monthly", "margin_yearly", "margin_3yr",
+    "customer_monthly", "customer_yearly", "customer_3yr",
+]
+
+
+@lru_cache(maxsize=1)
+def _resources(logo_path=LOGO_PATH):
+    """Stylesheet, table styles and logo bytes, built once per process."""
+    styles = getSampleStyleSheet()
+    logo_bytes = None
+    if os.path.exists(logo_path):
+        with open(logo_path, "rb") as f:
+            logo_bytes = f.read()
+    return {
+        "title": styles["Title"],
+        "fallback_logo": ParagraphStyle('fallbackLogo', fontSize=20, textColor=colors.HexColor("#d71920")),
+        "wrap": ParagraphStyle(name="wrap", fontSize=9, leading=11, alignment=1),
+        "disclaimer": ParagraphStyle('Disclaimer', fontSize=9, textColor=colors.grey, leading=12),
+        "config_table": TableStyle([
+            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
+            ('GRID', (0,0), (-1,-1), 0.25, colors.grey)
+        ]),
+        "pricing_table": TableStyle([
+            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
+            ('GRID', (0,0), (-1,-1), 0.25, colors.grey),
+            ('ALIGN', (1,1), (-1,-1), 'RIGHT'),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE')
+        ]),
+        "logo_bytes": logo_bytes,
+    }
+
+
+def quote_story(quote):
+    """Platypus flowables for one quote summary page."""
+    res = _resources()
+    story = []
+
+    if res["logo_bytes"] is not None:
+        logo = Image(BytesIO(res["logo_bytes"]))
+        logo._restrictSize(1.8*inch, 0.6*inch)
+    else:
+        logo = Paragraph("<b>Redsand.ai</b>", res["fallback_logo"])
+
+    header = [[Paragraph("Redsand Partner Configuration Summary", res["title"]), logo]]
+    story.append(Table(header, colWidths=[4.5*inch, 1.8*inch]))
+    story.append(Spacer(1, 12))
+
+    config_data = [
+        ["Use Case", quote["use_case"]],
+        ["GPU Type", quote["gpu_type"]],
+        ["Configuration", quote["configuration"]],
+        ["Units", quote["units"]]
+    ]
+    config_table = Table([["Field", "Value"]] + config_data, hAlign='LEFT')
+    config_table.setStyle(res["config_table"])
+    story.append(config_table)
+    story.append(Spacer(1, 18))
+
+    wrap_style = res["wrap"]
+    q = quote
+    pdf_pricing = [
+        [Paragraph("Period", wrap_style),
+         Paragraph("Base Redsand Price", wrap_style),
+         Paragraph(f"Partner Margin ({q['partner_margin']}%) – {q['partner_name']}", wrap_style),
+         Paragraph("Final Customer Price", wrap_style)],
+        ["Monthly", f"${q['redsand_monthly']:,.0f}", f"${q['margin_monthly']:,.0f}", f"${q['customer_monthly']:,.0f}"],
+        ["Yearly", f"${q['redsand_yearly']:,.0f}", f"${q['margin_yearly']:,.0f}", f"${q['customer_yearly']:,.0f}"],
+        ["3-Year Total", f"${q['redsand_3yr']:,.0f}", f"${q['margin_3yr']:,.0f}", f"${q['customer_3yr']:,.0f}"]
+    ]
+    pricing_table_pdf = Table(pdf_pricing, hAlign='LEFT', colWidths=[80, 120, 170, 150])
+    pricing_table_pdf.setStyle(res["pricing_table"])
+    story.append(pricing_table_pdf)
+
+    story.append(Spacer(1, 18))
+    story.append(Paragraph(DISCLAIMER, res["disclaimer"]))
+    return story
+
+
+def render_quote_pdf(quote):
+    """Render a quote summary PDF into memory and return its bytes."""
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=40, leftMargin=40, topMargin=60, bottomMargin=40)
+    story = quote_story(quote)
+    with tracer.span("pdf.build"):
+        doc.build(story)
+    return buffer.getvalue()
+
+
+def quote_pdf_key(quote):
+    payload = json.dumps({f: quote.get(f) for f in PDF_FIELDS}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class QuotePdfCache:
+    """LRU cache of rendered quote PDFs keyed by a hash of the quote inputs."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, quote, render=render_quote_pdf):
+        key = quote_pdf_key(quote)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        pdf = render(quote)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = pdf
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return pdf
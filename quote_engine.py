@@ -0,0 +1,310 @@
+import argparse
+import math
+import os
+import sys
+from bisect import bisect_right
+
+import numpy as np
+import pandas as pd
+
+# Money columns produced for every priced scenario, in the order the quote log uses them.
+MONEY_COLUMNS = [
+    "redsand_monthly", "redsand_yearly", "redsand_3yr",
+    "margin_monthly", "margin_yearly", "margin_3yr",
+    "customer_monthly", "customer_yearly", "customer_3yr",
+]
+
+
+# ---------------- PRICING ----------------
+def price_arrays(price_per_unit, units, margin_percent):
+    """Customer / partner margin / Redsand figures for arrays (or scalars) of inputs."""
+    price_per_unit = np.asarray(price_per_unit, dtype=float)
+    units = np.asarray(units, dtype=float)
+    margin_percent = np.asarray(margin_percent, dtype=float)
+
+    # --- Constant customer price ---
+    customer_monthly = price_per_unit * units
+    customer_yearly = customer_monthly * 12
+    customer_3yr = customer_yearly * 3
+
+    # --- Partner margin extracted ---
+    margin_monthly = customer_monthly * (margin_percent / 100)
+    margin_yearly = margin_monthly * 12
+    margin_3yr = margin_yearly * 3
+
+    # --- Redsand base adjusts dynamically ---
+    redsand_monthly = customer_monthly - margin_monthly
+    redsand_yearly = customer_yearly - margin_yearly
+    redsand_3yr = customer_3yr - margin_3yr
+
+    return {
+        "redsand_monthly": redsand_monthly,
+        "redsand_yearly": redsand_yearly,
+        "redsand_3yr": redsand_3yr,
+        "margin_monthly": margin_monthly,
+        "margin_yearly": margin_yearly,
+        "margin_3yr": margin_3yr,
+        "customer_monthly": customer_monthly,
+        "customer_yearly": customer_yearly,
+        "customer_3yr": customer_3yr,
+    }
+
+
+def price_quote(price_per_unit, units, margin_percent):
+    """Scalar version of price_arrays for a single quote."""
+    return {k: float(v) for k, v in price_arrays(price_per_unit, units, margin_percent).items()}
+
+
+# ---------------- SIZING ----------------
+def _first_by(frame, key, value):
+    """Map key -> value using the first row per key, matching the app's .iloc[0] lookups."""
+    return frame.drop_duplicates(key).set_index(key)[value]
+
+
+class UpgradeLadder:
+    """Upgrade rules for one GPU, sorted by user threshold for binary search.
+
+    The app has always applied the first matching rule in file order, so alongside the sorted
+    thresholds we keep, for every prefix, the earliest-in-file rule it contains.
+    """
+    __slots__ = ("thresholds", "upgrades")
+
+    def __init__(self, rules):
+        # rules: [(file_position, user_threshold, upgrade_gpu), ...]
+        ordered = sorted(rules, key=lambda r: r[1])
+        self.thresholds = [r[1] for r in ordered]
+        self.upgrades = []
+        best = None
+        for rule in ordered:
+            if best is None or rule[0] < best[0]:
+                best = rule
+            self.upgrades.append(best[2])
+
+    def resolve(self, gpu, num_users):
+        i = bisect_right(self.thresholds, num_users)
+        return self.upgrades[i - 1] if i else gpu
+
+    def resolve_many(self, gpu, users):
+        """`resolve` for an array of user counts; NaN counts keep `gpu`."""
+        i = np.searchsorted(self.thresholds, users, side="right")
+        i[np.isnan(users)] = 0
+        return np.array([gpu] + self.upgrades, dtype=object)[i]
+
+
+def upgrade_ladders(upgrade_rules):
+    """GPU type -> UpgradeLadder for an upgrade rules frame."""
+    rules_by_gpu = {}
+    for pos, row in enumerate(upgrade_rules.itertuples(index=False)):
+        rules_by_gpu.setdefault(row.current_gpu, []).append((pos, float(row.user_threshold), row.upgrade_gpu))
+    return {gpu: UpgradeLadder(rules) for gpu, rules in rules_by_gpu.items()}
+
+
+def auto_units(users, users_per_unit):
+    """Units for a user count (scalar or array): always at least 1."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.maximum(1, np.ceil(np.asarray(users, dtype=float) / users_per_unit))
+
+
+def size_auto(workloads, upgrade_rules, configs, use_cases, users, ladders=None):
+    """Vectorized Auto sizing: returns (units, gpu_type, configuration) arrays.
+
+    `ladders` (from `upgrade_ladders`) can be passed in when the caller already holds them.
+    """
+    use_cases = pd.Series(np.asarray(use_cases, dtype=object))
+    users = np.asarray(users, dtype=float)
+
+    sizing = workloads.drop_duplicates("workload_name").set_index("workload_name")
+    base_gpu = use_cases.map(sizing["gpu_type"])
+    units = auto_units(users, use_cases.map(sizing["users_per_unit"]).to_numpy(dtype=float))
+
+    # Apply upgrade rules if thresholds are exceeded
+    base = base_gpu.to_numpy(dtype=object)
+    gpu = base.copy()
+    for gpu_type, ladder in (ladders if ladders is not None else upgrade_ladders(upgrade_rules)).items():
+        hit = base == gpu_type
+        if hit.any():
+            gpu[hit] = ladder.resolve_many(gpu_type, users[hit])
+
+    # Match config by upgraded GPU
+    config = pd.Series(gpu).map(_first_by(configs, "gpu_type", "configuration_name")).fillna("Unknown")
+    return units, gpu, config.to_numpy(dtype=object)
+
+
+def size_manual(configs, configurations):
+    """GPU type for each manually chosen configuration ("Unknown" if not in the catalog)."""
+    gpu = pd.Series(np.asarray(configurations, dtype=object)).map(_first_by(configs, "configuration_name", "gpu_type"))
+    return gpu.fillna("Unknown").to_numpy(dtype=object)
+
+
+# ---------------- BATCH ----------------
+def quote_batch(scenarios, workloads, upgrade_rules, pricing, configs):
+    """Size and price many scenarios in one pass.
+
+    `scenarios` is a DataFrame (or dict of arrays) with either `use_case` + `users` (Auto)
+    or `configuration` + `units` (Manual), plus an optional `partner_margin` percentage.
+    Rows where `use_case` is set are sized automatically; the rest are taken as manual.
+    Scenarios with no price in pricing.csv get NaN money columns.
+    """
+    df = pd.DataFrame(scenarios).reset_index(drop=True)
+    n = len(df)
+    margin = pd.to_numeric(df.get("partner_margin", pd.Series(0, index=df.index)), errors="coerce").fillna(0)
+
+    use_case = df["use_case"] if "use_case" in df else pd.Series([None] * n, dtype=object)
+    is_auto = use_case.notna().to_numpy() & (use_case.astype(str) != "Manual").to_numpy()
+
+    units = np.zeros(n)
+    gpu = np.full(n, "Unknown", dtype=object)
+    config = np.full(n, "Unknown", dtype=object)
+
+    if is_auto.any():
+        users = pd.to_numeric(df.loc[is_auto, "users"], errors="coerce").to_numpy()
+        units[is_auto], gpu[is_auto], config[is_auto] = size_auto(
+            workloads, upgrade_rules, configs, use_case[is_auto], users
+        )
+    if (~is_auto).any():
+        config[~is_auto] = df.loc[~is_auto, "configuration"].to_numpy(dtype=object)
+        units[~is_auto] = pd.to_numeric(df.loc[~is_auto, "units"], errors="coerce").to_numpy()
+        gpu[~is_auto] = size_manual(configs, config[~is_auto])
+
+    price_per_unit = pd.Series(config).map(_first_by(pricing, "configuration_name", "monthly_price_usd")).to_numpy(dtype=float)
+
+    out = pd.DataFrame({
+        "use_case": np.where(is_auto, use_case.to_numpy(dtype=object), "Manual"),
+        "configuration": config,
+        "gpu_type": gpu,
+        "units": units,
+        "partner_margin": margin.to_numpy(dtype=float),
+        "price_per_unit": price_per_unit,
+    })
+    for col, values in price_arrays(price_per_unit, units, out["partner_margin"].to_numpy()).items():
+        out[col] = values
+    return out
+
+
+def scenario_from_request(item, default_margin, use_cases=None, max_margin=None):
+    """Validate one JSON quote request into a quote_batch scenario row; raises ValueError.
+
+    Auto requests carry `use_case` + `users`, manual ones `configuration` + `units`; either may
+    set `partner_margin` (percent), otherwise `default_margin` applies. `use_cases`, when given,
+    rejects unknown workloads; `max_margin` caps `partner_margin`, so a caller can lower its
+    margin but never raise it above `max_margin`.
+    """
+    if not isinstance(item, dict):
+        raise ValueError("each quote must be an object")
+    margin = item.get("partner_margin", default_margin)
+    if max_margin is None:
+        if isinstance(margin, bool) or not isinstance(margin, (int, float)) or not 0 <= margin < 100:
+            raise ValueError("partner_margin must be a number in [0, 100)")
+    elif isinstance(margin, bool) or not isinstance(margin, (int, float)) or not 0 <= margin <= max_margin:
+        raise ValueError(f"partner_margin must be a number in [0, {max_margin:g}]")
+    if item.get("use_case") is not None:
+        use_case = str(item["use_case"])
+        if use_cases is not None and use_case not in use_cases:
+            raise ValueError(f"unknown use_case {use_case!r}")
+        users = item.get("users")
+        # Whole users from 1, like the portal's users input, up to the sweep's range.
+        if (isinstance(users, bool) or not isinstance(users, (int, float)) or not 1 <= users <= SWEEP_MAX_USERS
+                or not float(users).is_integer()):
+            raise ValueError(f"auto quotes need a whole number of users from 1 to {SWEEP_MAX_USERS:,}")
+        return {"use_case": use_case, "users": int(users), "configuration": None, "units": None,
+                "partner_margin": margin}
+    if item.get("configuration") is not None:
+        units = item.get("units")
+        # Whole units only, like the portal's units input (step=1).
+        if (isinstance(units, bool) or not isinstance(units, (int, float)) or not 0 < units < math.inf
+                or not float(units).is_integer()):
+            raise ValueError("manual quotes need a positive whole number of units")
+        return {"use_case": None, "users": None, "configuration": str(item["configuration"]), "units": int(units),
+                "partner_margin": margin}
+    raise ValueError("each quote needs use_case + users or configuration + units")
+
+
+def json_value(value):
+    """A priced cell as JSON: NaN becomes null and whole floats become ints."""
+    if isinstance(value, float):
+        if value != value:
+            return None
+        return int(value) if value.is_integer() else value
+    return value
+
+
+# The original app logged the unit price and customer totals as ints (int price x int units)
+# and the margin and Redsand figures as floats; rows in the shared sheet keep that format.
+LOG_INT_COLUMNS = ("units", "price_per_unit", "customer_monthly", "customer_yearly", "customer_3yr")
+
+
+def log_values(units, price_per_unit, money):
+    """Quote log cells for units, unit price and MONEY_COLUMNS, formatted as the original app wrote them."""
+    values = {"units": units, "price_per_unit": price_per_unit, **{col: money[col] for col in MONEY_COLUMNS}}
+    return {col: str(int(v) if col in LOG_INT_COLUMNS and float(v).is_integer() else v) for col, v in values.items()}
+
+
+# ---------------- SWEEP ----------------
+SWEEP_MAX_USERS = 1_000_000
+
+
+def price_curve(workloads, upgrade_rules, pricing, configs, use_case, partner_margin, max_users=SWEEP_MAX_USERS):
+    """Auto sizing and pricing for every user count 1..max_users, compressed to step boundaries.
+
+    Returns one row per step (users_from..users_to share units, GPU and configuration), so a
+    point lookup is a binary search with `curve_point`.
+    """
+    # Sizing can only change where ceil(users / users_per_unit) ticks over or an upgrade threshold
+    # is crossed, so evaluate size_auto at those candidate user counts instead of at every count.
+    sizing = workloads.drop_duplicates("workload_name").set_index("workload_name").loc[use_case]
+    users_per_unit = float(sizing["users_per_unit"])
+    ticks = np.floor(np.arange(1, math.ceil(max_users / users_per_unit) + 1) * users_per_unit) + 1
+    thresholds = np.ceil(upgrade_rules["user_threshold"].to_numpy(dtype=float))
+    users = np.unique(np.concatenate([[1.0], ticks, thresholds]))
+    users = users[(users >= 1) & (users <= max_users)]
+    units, gpu, config = size_auto(workloads, upgrade_rules, configs, np.full(len(users), use_case, dtype=object), users)
+
+    changed = np.ones(len(users), dtype=bool)
+    changed[1:] = (units[1:] != units[:-1]) | (gpu[1:] != gpu[:-1]) | (config[1:] != config[:-1])
+    starts = np.flatnonzero(changed)
+    users_from = users[starts]
+    users_to = np.append(users_from[1:] - 1, max_users)
+
+    step_config = config[starts]
+    price_per_unit = pd.Series(step_config).map(_first_by(pricing, "configuration_name", "monthly_price_usd")).to_numpy(dtype=float)
+    curve = pd.DataFrame({
+        "users_from": users_from.astype(np.int64),
+        "users_to": users_to.astype(np.int64),
+        "units": units[starts],
+        "gpu_type": gpu[starts],
+        "configuration": step_config,
+        "price_per_unit": price_per_unit,
+    })
+    for col, values in price_arrays(price_per_unit, curve["units"].to_numpy(), partner_margin).items():
+        curve[col] = values
+    return curve
+
+
+def curve_point(curve, num_users):
+    """The step of a price_curve that covers `num_users`."""
+    i = int(np.searchsorted(curve["users_from"].to_numpy(), num_users, side="right")) - 1
+    return curve.iloc[max(i, 0)]
+
+
+def load_catalog_frames(base_dir="."):
+    """Read the catalog CSVs the quote engine needs (workloads, upgrade rules, pricing, configs)."""
+    return tuple(
+        pd.read_csv(os.path.join(base_dir, name))
+        for name in ("workloads.csv", "gpu_upgrade_rules.csv", "pricing.csv", "redbox_configs.csv")
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reprice a CSV of quote scenarios.")
+    parser.add_argument("scenarios", help="CSV with use_case/users or configuration/units, optional partner_margin")
+    parser.add_argument("-o", "--output", default="-", help="output CSV (default: stdout)")
+    parser.add_argument("--catalog-dir", default=".", help="directory holding the catalog CSVs")
+    args = parser.parse_args(argv)
+
+    workloads, upgrade_rules, pricing, configs = load_catalog_frames(args.catalog_dir)
+    result = quote_batch(pd.read_csv(args.scenarios), workloads, upgrade_rules, pricing, configs)
+    result.to_csv(sys.stdout if args.output == "-" else args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import gspread
+import pandas as pd
+
+from local_state import STATE_DIR, is_own_file, state_path
+from sheets import LOG_HEADERS, is_retryable
+
+# Defaults in the private state directory: the spool holds quoted prices and whatever is in it
+# is appended to the sheet, so other local users must not be able to read or pre-create it.
+SPOOL_PATH = os.path.join(STATE_DIR, "quote_spool.sqlite")
+FAILED_LOGS_CSV = os.path.join(STATE_DIR, "failed_logs.csv")
+LEGACY_SPOOL_PATH = "/tmp/redsand_quote_spool.sqlite"
+LEGACY_FAILED_LOGS_CSV = "/tmp/failed_logs.csv"
+# A claim older than this is presumed to belong to a writer that died mid-batch.
+CLAIM_LEASE_SECONDS = 600
+
+
+class QuoteLogWriter:
+    """Durable, batched writer for the quote log sheet.
+
+    `submit` only inserts the row into a local SQLite spool and returns. A daemon thread drains
+    the spool with one `append_rows` call per batch, backing off on quota errors, and deletes rows
+    only once Sheets has accepted them, so nothing is lost across restarts.
+
+    Several writers may drain the same spool (e.g. two app processes on one host): each batch is
+    claimed inside a write transaction before it is sent, so no two writers send the same rows.
+    Rows submitted with a `batch` key (e.g. one bulk quote pack) are always sent together in
+    one `append_rows` call of their own, whatever `batch_size` is.
+
+    A batch the sheet rejects outright (a 4xx other than 429) `max_attempts` times is moved to
+    the `dead_letter` table instead of blocking every later quote.
+    """
+
+    def __init__(self, open_sheet, spool_path=SPOOL_PATH, failed_csv=FAILED_LOGS_CSV,
+                 batch_size=200, flush_interval=2.0, max_backoff=64.0, max_attempts=5,
+                 on_client_error=None, debug_log=None):
+        # open_sheet returns the log worksheet (normally a pooled handle, see sheets.SheetsPool).
+        self.open_sheet = open_sheet
+        self.on_client_error = on_client_error
+        self.spool_path = spool_path
+        self.failed_csv = failed_csv
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self.debug_log = debug_log or (lambda message: None)
+
+        self.api_calls = 0
+        self.rows_written = 0
+        self.rows_dead_lettered = 0
+        self.last_error = None
+        self.writer_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._sheet = None
+        self._headers = None
+        self._failures = 0
+
+        if spool_path == SPOOL_PATH:
+            state_path(os.path.basename(SPOOL_PATH))  # creates the private directory, or refuses
+        self._db = sqlite3.connect(spool_path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        with self._transaction():
+            self._db.execute("CREATE TABLE IF NOT EXISTS spool (id INTEGER PRIMARY KEY AUTOINCREMENT, row TEXT NOT NULL)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS dead_letter "
+                             "(id INTEGER PRIMARY KEY, row TEXT NOT NULL, error TEXT, failed_at REAL)")
+            # Spools written by older versions lack the claim and batch columns.
+            for table, column, ddl in [("spool", "batch", "TEXT"), ("spool", "claimed_by", "TEXT"),
+                                       ("spool", "claimed_at", "REAL"), ("spool", "attempts", "INTEGER NOT NULL DEFAULT 0"),
+                                       ("dead_letter", "batch", "TEXT")]:
+                if column not in {r[1] for r in self._db.execute(f"PRAGMA table_info({table})")}:
+                    self._db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+            self._db.execute("CREATE INDEX IF NOT EXISTS spool_batch ON spool (batch)")
+            # Idempotency keys of every row ever submitted with one, kept after the row is sent.
+            self._db.execute("CREATE TABLE IF NOT EXISTS submitted_keys (key TEXT PRIMARY KEY)")
+
+    # ---------------- PRODUCERS ----------------
+    def submit(self, log_row):
+        self.submit_many([log_row])
+
+    def submit_many(self, log_rows, batch=None, keys=None):
+        """Spool rows; rows sharing a `batch` key are written to the sheet in one call of their own.
+
+        With `keys` (one idempotency key per row), a row whose key this spool has seen before is
+        skipped, even if it was sent long ago; returns how many rows were spooled.
+        """
+        payload = [(json.dumps({k: "" if v is None else str(v) for k, v in row.items()}), batch) for row in log_rows]
+        if not payload:
+            return 0
+        # One transaction, so no writer can claim half of a batch.
+        with self._lock, self._transaction():
+            if keys is not None:
+                fresh = [self._db.execute("INSERT OR IGNORE INTO submitted_keys (key) VALUES (?)", (key,)).rowcount
+                         for key in keys]
+                payload = [item for item, new in zip(payload, fresh) if new]
+            self._db.executemany("INSERT INTO spool (row, batch) VALUES (?, ?)", payload)
+        self._wake.set()
+        return len(payload)
+
+    def pending(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+    def dead_letters(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM dead_letter").fetchone()[0]
+
+    def requeue_dead_letters(self):
+        """Move dead-lettered rows back to the end of the spool; returns how many."""
+        with self._lock, self._transaction():
+            count = self._db.execute("INSERT INTO spool (row, batch) SELECT row, batch FROM dead_letter ORDER BY id").rowcount
+            self._db.execute("DELETE FROM dead_letter")
+        self._wake.set()
+        return count
+
+    # ---------------- WORKER ----------------
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            if self.spool_path == SPOOL_PATH:
+                self.import_legacy_spool()
+            self.replay_failed_csv()
+            self._thread = threading.Thread(target=self._run, name="quote-log-writer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def import_legacy_spool(self, path=LEGACY_SPOOL_PATH):
+        """Move unsent rows from the spool older versions kept in /tmp into this one; returns how many.
+
+        Only a file this user owns and no one else can write is trusted; anything else may have
+        been planted to get rows into the sheet, and is left alone.
+        """
+        if not is_own_file(path):
+            return 0
+        try:
+            legacy = sqlite3.connect(path)
+            try:
+                rows = legacy.execute("SELECT row FROM spool ORDER BY id").fetchall()
+            finally:
+                legacy.close()
+            with self._lock, self._transaction():
+                self._db.executemany("INSERT INTO spool (row) VALUES (?)", rows)
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            self.debug_log(f"Moved {len(rows)} rows from {path} into {self.spool_path}")
+            return len(rows)
+        except Exception as e:
+            self.debug_log(f"Failed to import {path}: {e}")
+            return 0
+
+    def replay_failed_csv(self):
+        """Move rows left in the failed-log CSV (and the legacy one in /tmp) back into the spool."""
+        replayed = 0
+        for path in (self.failed_csv, LEGACY_FAILED_LOGS_CSV if self.failed_csv == FAILED_LOGS_CSV else None):
+            # Like the legacy spool, a CSV someone else could have written is never replayed.
+            if not path or not is_own_file(path):
+                continue
+            try:
+                failed = pd.read_csv(path, dtype=str, keep_default_na=False)
+                self.submit_many(failed.to_dict("records"))
+                if path == LEGACY_FAILED_LOGS_CSV:
+                    os.remove(path)  # don't leave a readable copy in /tmp
+                else:
+                    os.replace(path, path + ".replayed")
+                self.debug_log(f"Replayed {len(failed)} rows from {path}")
+                replayed += len(failed)
+            except Exception as e:
+                self.debug_log(f"Failed to replay {path}: {e}")
+        return replayed
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            # Let a burst of submissions accumulate into a single batch.
+            time.sleep(min(self.flush_interval, 0.25))
+            while self.flush() and not self._stop.is_set():
+                pass
+            if self._failures:
+                delay = min(self.max_backoff, 2 ** self._failures) + random.uniform(0, 1)
+                self.debug_log(f"Quote log writer backing off {delay:.1f}s")
+                self._stop.wait(delay)
+
+    def flush(self):
+        """Send one batch; returns True if a batch went out and more may be waiting."""
+        batch = self._claim()
+        if not batch:
+            return False
+        try:
+            sheet = self._worksheet()
+            rows = [json.loads(row) for _, row in batch]
+            self.api_calls += 1
+            sheet.append_rows([[row.get(h, "") for h in self._headers] for row in rows],
+                              value_input_option="RAW")
+        except Exception as e:
+            self.last_error = e
+            self._failures += 1
+            api_error = isinstance(e, gspread.exceptions.APIError)
+            if not api_error or not is_retryable(e):
+                # Client/auth problems: drop cached handles so the next attempt re-authorizes.
+                self._sheet = None
+                if self.on_client_error is not None:
+                    self.on_client_error()
+            self._release(batch, e, rejected=api_error and not is_retryable(e))
+            self.debug_log(f"Quote log flush failed ({len(batch)} rows pending): {e}")
+            return False
+        with self._lock:
+            self._db.executemany("DELETE FROM spool WHERE id = ?", [(row_id,) for row_id, _ in batch])
+        self._failures = 0
+        self.rows_written += len(batch)
+        self.debug_log(f"Logged {len(batch)} quotes to Google Sheets")
+        return True
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the spool's write lock up front, so claims from other
+        # connections (threads or processes) are serialized.
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def _claim(self):
+        """Claim the oldest unclaimed (or lease-expired) rows for this writer.
+
+        If the oldest row belongs to a submitted batch, that whole batch is claimed; otherwise up
+        to `batch_size` rows that belong to no batch.
+        """
+        now = time.time()
+        claimable = "(claimed_by IS NULL OR claimed_at < ?)"
+        expired = now - CLAIM_LEASE_SECONDS
+        with self._lock, self._transaction():
+            head = self._db.execute(f"SELECT batch FROM spool WHERE {claimable} ORDER BY id LIMIT 1", (expired,)).fetchone()
+            if head is None:
+                batch = []
+            elif head[0] is None:
+                batch = self._db.execute(
+                    f"SELECT id, row FROM spool WHERE batch IS NULL AND {claimable} ORDER BY id LIMIT ?",
+                    (expired, self.batch_size),
+                ).fetchall()
+            else:
+                batch = self._db.execute(
+                    f"SELECT id, row FROM spool WHERE batch = ? AND {claimable} ORDER BY id", (head[0], expired)
+                ).fetchall()
+            self._db.executemany("UPDATE spool SET claimed_by = ?, claimed_at = ? WHERE id = ?",
+                                 [(self.writer_id, now, row_id) for row_id, _ in batch])
+        return batch
+
+    def _release(self, batch, error, rejected):
+        """Hand a failed batch back to the spool; dead-letter it once the sheet has rejected it too often."""
+        ids = [row_id for row_id, _ in batch]
+        with self._lock, self._transaction():
+            dead = []
+            if rejected:
+                claimed = self._db.execute(
+                    "SELECT id, row, batch, attempts FROM spool WHERE claimed_by = ? AND id BETWEEN ? AND ?",
+                    (self.writer_id, ids[0], ids[-1]),
+                ).fetchall()
+                batch_ids = set(ids)
+                dead = [(row_id, row, key) for row_id, row, key, attempts in claimed
+                        if row_id in batch_ids and attempts + 1 >= self.max_attempts]
+            # Rows whose lease ran out may have been claimed by another writer since; leave those alone.
+            self._db.executemany(
+                "UPDATE spool SET claimed_by = NULL, claimed_at = NULL, attempts = attempts + ? "
+                "WHERE id = ? AND claimed_by = ?",
+                [(int(rejected), row_id, self.writer_id) for row_id in ids],
+            )
+            if dead:
+                self._db.executemany("INSERT INTO dead_letter (row, batch, error, failed_at) VALUES (?, ?, ?, ?)",
+                                     [(row, key, str(error), time.time()) for _, row, key in dead])
+                self._db.executemany("DELETE FROM spool WHERE id = ?", [(row_id,) for row_id, _, _ in dead])
+        if dead:
+            self.rows_dead_lettered += len(dead)
+            self._failures = 0  # the next batch has not failed yet
+            self.debug_log(f"Moved {len(dead)} rejected quote log rows to the dead-letter table: {error}")
+
+    def _worksheet(self):
+        if self._sheet is None:
+            sheet = self.open_sheet()
+            self.api_calls += 1
+            headers = sheet.row_values(1)
+            if not headers:
+                self.debug_log("Sheet is empty, setting headers")
+                self.api_calls += 1
+                sheet.append_row(LOG_HEADERS)
+                headers = LOG_HEADERS
+            self._sheet, self._headers = sheet, headers
+        return self._sheet
@@ -0,0 +1,268 @@
+"""Headless JSON quote service.
+
+Sizes and prices quotes with the same engine as the portal's Auto and Manual modes, for
+partner systems that need quotes without driving the UI. Partners authenticate with HTTP
+Basic auth (partner code and password from partner_credentials.csv) and are quoted at their
+own margin; an item's `partner_margin` may lower that margin but not raise it.
+
+    POST /v1/quotes   {"quotes": [{"use_case": "Chat Bot", "users": 1200},
+                                  {"configuration": "RedBox One", "units": 2}]}
+    GET  /v1/catalog  use cases and configurations
+    GET  /healthz     queue depth and batch counters
+
+Items from concurrent requests are queued and priced together by one batcher, one
+quote_batch call per batch. When the queue is full, requests are rejected with 503 and a
+Retry-After header rather than queued without bound. Password checks that miss the verified
+cache (PBKDF2, ~100 ms each) run on a small thread pool, never on the event loop, and are
+rejected with 503 in the same way when too many are waiting.
+
+Usage: python quote_service.py [--host 127.0.0.1] [--port 8600] [--catalog-dir .]
+"""
+import argparse
+import asyncio
+import base64
+import binascii
+import json
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from catalog_store import CatalogStore
+from quote_engine import json_value, quote_batch, scenario_from_request
+from tracing import tracer
+
+MAX_BODY_BYTES = 1_000_000
+MAX_ITEMS_PER_REQUEST = 1000
+AUTH_WORKERS = 2
+MAX_PENDING_AUTH = 64
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+               405: "Method Not Allowed", 413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+# ---------------- BATCHING ----------------
+class QuoteBatcher:
+    """Prices queued scenarios in batches of up to `max_batch`, one quote_batch call each."""
+
+    def __init__(self, store, max_batch=512, max_pending=4096):
+        self.store = store
+        self.max_batch = max_batch
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.batches = 0
+        self.quotes = 0
+        self.rejected = 0
+
+    async def quote(self, scenarios):
+        """Price scenarios; raises HttpError(503) if they don't fit in the queue."""
+        if self.queue.maxsize - self.queue.qsize() < len(scenarios):
+            self.rejected += 1
+            raise HttpError(503, "quote queue is full, retry shortly", {"Retry-After": "1"})
+        loop = asyncio.get_running_loop()
+        futures = []
+        for scenario in scenarios:
+            future = loop.create_future()
+            self.queue.put_nowait((scenario, future))
+            futures.append(future)
+        return await asyncio.gather(*futures)
+
+    async def run(self):
+        while True:
+            batch = [await self.queue.get()]
+            # Let handlers that are already runnable enqueue before pricing.
+            await asyncio.sleep(0)
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            self._price(batch)
+
+    def _price(self, batch):
+        catalog = self.store.current()
+        try:
+            with tracer.span("service.batch", size=len(batch)):
+                priced = quote_batch([s for s, _ in batch], catalog.workloads, catalog.upgrade_rules,
+                                     catalog.pricing, catalog.configs)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.batches += 1
+        self.quotes += len(batch)
+        for (_, future), row in zip(batch, priced.to_dict("records")):
+            if future.done():
+                continue  # client went away
+            result = {k: json_value(v) for k, v in row.items()}
+            if result["price_per_unit"] is None:
+                result["error"] = "no price for this configuration"
+            else:
+                result["quote_id"] = str(uuid.uuid4())[:8]
+            future.set_result(result)
+
+
+# ---------------- HTTP ----------------
+class QuoteService:
+    def __init__(self, store, max_batch=512, max_pending=4096, auth_workers=AUTH_WORKERS,
+                 max_pending_auth=MAX_PENDING_AUTH):
+        self.store = store
+        self.batcher = QuoteBatcher(store, max_batch=max_batch, max_pending=max_pending)
+        self.max_pending_auth = max_pending_auth
+        self.auth_pending = 0
+        self._auth_pool = ThreadPoolExecutor(max_workers=auth_workers, thread_name_prefix="quote-auth")
+
+    async def authenticate(self, headers):
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "basic":
+            raise HttpError(401, "partner credentials required", {"WWW-Authenticate": 'Basic realm="redsand"'})
+        try:
+            code, _, password = base64.b64decode(token).decode("utf-8").partition(":")
+        except (binascii.Error, UnicodeDecodeError):
+            raise HttpError(401, "malformed credentials", {"WWW-Authenticate": 'Basic realm="redsand"'})
+        partners = self.store.current().partners
+        partner = partners.authenticate_cached(code, password)
+        if partner is None:
+            # Bad passwords, unknown codes and first logins after a reload need a full PBKDF2 check.
+            if self.auth_pending >= self.max_pending_auth:
+                raise HttpError(503, "too many logins in progress, retry shortly", {"Retry-After": "1"})
+            self.auth_pending += 1
+            try:
+                partner = await asyncio.get_running_loop().run_in_executor(
+                    self._auth_pool, partners.authenticate, code, password)
+            finally:
+                self.auth_pending -= 1
+        if partner is None:
+            raise HttpError(401, "invalid partner code or password", {"WWW-Authenticate": 'Basic realm="redsand"'})
+        return partner
+
+    async def handle(self, method, path, headers, body):
+        if path == "/healthz":
+            return {"status": "ok", "catalog_version": self.store.current().version,
+                    "pending": self.batcher.queue.qsize(), "pending_auth": self.auth_pending,
+                    "batches": self.batcher.batches, "quotes": self.batcher.quotes, "rejected": self.batcher.rejected}
+        if path == "/v1/catalog":
+            partner = await self.authenticate(headers)
+            catalog = self.store.current()
+            return {"version": catalog.version, "partner_margin": partner.margin_percent,
+                    "use_cases": catalog.workload_names,
+                    "configurations": [{"configuration": name, "gpu_type": catalog.gpu_for_config(name),
+                                        "monthly_price_usd": catalog.price(name)} for name in catalog.config_names]}
+        if path == "/v1/quotes":
+            if method != "POST":
+                raise HttpError(405, "use POST", {"Allow": "POST"})
+            partner = await self.authenticate(headers)
+            catalog = self.store.current()
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError:
+                raise HttpError(400, "body is not valid JSON")
+            items = payload.get("quotes", [payload]) if isinstance(payload, dict) else payload
+            if not isinstance(items, list) or not items:
+                raise HttpError(400, "expected a quote object or {\"quotes\": [...]}")
+            if len(items) > MAX_ITEMS_PER_REQUEST:
+                raise HttpError(413, f"at most {MAX_ITEMS_PER_REQUEST} quotes per request")
+            try:
+                # A partner may quote below its contracted margin, never above it.
+                scenarios = [scenario_from_request(item, partner.margin_percent, catalog.workload_names,
+                                                   max_margin=partner.margin_percent) for item in items]
+            except ValueError as e:
+                raise HttpError(400, str(e))
+            quotes = await self.batcher.quote(scenarios)
+            for quote in quotes:
+                quote["partner_name"] = partner.partner_name
+            return {"quotes": quotes}
+        raise HttpError(404, f"no route for {path}")
+
+    async def serve_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, version = (request_line.decode("latin-1").split() + ["", "", ""])[:3]
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                status, extra, body = 200, {}, b""
+                try:
+                    try:
+                        length = int(headers.get("content-length") or 0)
+                    except ValueError:
+                        length = -1
+                    if length < 0:
+                        # Without a usable length the body can't be framed, so the connection can't be reused.
+                        raise HttpError(400, "invalid Content-Length", {"Connection": "close"})
+                    if length > MAX_BODY_BYTES:
+                        raise HttpError(413, "request body too large", {"Connection": "close"})
+                    body = await reader.readexactly(length) if length else b""
+                    with tracer.span("service.request", path=path.split("?")[0]):
+                        result = await self.handle(method, path.split("?")[0], headers, body)
+                except HttpError as e:
+                    status, extra, result = e.status, e.headers, {"error": str(e)}
+                except Exception as e:
+                    tracer.log("quote service error", error=f"{type(e).__name__}: {e}")
+                    status, result = 500, {"error": "internal error"}
+
+                try:
+                    # NaN and Infinity are not JSON; json_value already maps NaN to null.
+                    payload = json.dumps(result, allow_nan=False).encode("utf-8")
+                except ValueError as e:
+                    tracer.log("quote service error", error=f"{type(e).__name__}: {e}")
+                    status, extra, payload = 500, {}, json.dumps({"error": "internal error"}).encode("utf-8")
+
+                keep_alive = (headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                              and extra.get("Connection") != "close")
+                head = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'Internal Server Error')}",
+                        "Content-Type: application/json", f"Content-Length: {len(payload)}",
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                head += [f"{k}: {v}" for k, v in extra.items() if k != "Connection"]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        batcher = asyncio.create_task(self.batcher.run())
+        server = await asyncio.start_server(self.serve_connection, host, port)
+        print(f"Quote service listening on http://{host}:{port}", file=sys.stderr)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self._auth_pool.shutdown(wait=False, cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve Redsand sizing and pricing over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--catalog-dir", default=".", help="directory holding the catalog CSVs")
+    parser.add_argument("--max-batch", type=int, default=512, help="most quotes priced per engine call")
+    parser.add_argument("--max-pending", type=int, default=4096, help="queued quotes before requests get 503")
+    parser.add_argument("--auth-workers", type=int, default=AUTH_WORKERS, help="threads for password hash checks")
+    args = parser.parse_args(argv)
+
+    service = QuoteService(CatalogStore(args.catalog_dir), max_batch=args.max_batch, max_pending=args.max_pending,
+                           auth_workers=max(1, args.auth_workers))
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
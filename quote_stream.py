@@ -0,0 +1,310 @@
+"""Streaming batch quote processor.
+
+Reads quote requests as JSONL from a file or stdin, prices them in fixed-size chunks with the
+app's sizing and margin logic, and writes one JSON result per input line. Memory use is bounded
+by the chunk size, regardless of how long the input is.
+
+Each request line is a quote as accepted by the quote service plus optional fields:
+
+    {"request_id": "crm-1", "partner_code": "ALPHA01", "use_case": "Chat Bot", "users": 1200,
+     "customer": "Acme", "pdf": true, "log": true}
+
+`partner_code` defaults to --partner-code and sets the margin and partner name. "pdf" renders
+the quote summary PDF into --pdf-dir. "log" appends the quote to the Google Sheets quote log
+through a durable spool of its own (needs --service-account; see --spool).
+
+With --checkpoint, the input and output byte offsets are saved after every chunk, once that
+chunk's output is on disk. Rerunning the same command after a crash continues from there.
+Quote IDs are derived from a run ID kept in the checkpoint and the input line number, so lines
+replayed after a crash get the same IDs (and PDF names) again, and the spool skips log rows it
+already has for them.
+
+Usage: python quote_stream.py requests.jsonl -o quotes.jsonl [--checkpoint quotes.ckpt]
+       cat requests.jsonl | python quote_stream.py - -o - --partner-code ALPHA01
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+from catalog_store import CatalogStore
+from quote_engine import json_value, quote_batch, scenario_from_request
+from tracing import tracer
+
+CHUNK_SIZE = 1000
+REPORT_INTERVAL = 5.0
+
+
+# ---------------- CHECKPOINT ----------------
+def read_checkpoint(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_checkpoint(path, state):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+# ---------------- THROUGHPUT ----------------
+class Throughput:
+    """Overall and recent (exponentially smoothed) lines per second."""
+
+    def __init__(self, smoothing=0.3):
+        self.smoothing = smoothing
+        self.lines = 0
+        self.rate = None
+        self.started = self._last = time.perf_counter()
+
+    def add(self, lines):
+        now = time.perf_counter()
+        self.lines += lines
+        instant = lines / max(now - self._last, 1e-9)
+        self.rate = instant if self.rate is None else self.smoothing * instant + (1 - self.smoothing) * self.rate
+        self._last = now
+
+    @property
+    def overall(self):
+        return self.lines / max(time.perf_counter() - self.started, 1e-9)
+
+
+# ---------------- PROCESSING ----------------
+class QuoteStreamProcessor:
+    def __init__(self, store, partner_code=None, pdf_dir=None, log_writer=None, chunk_size=CHUNK_SIZE):
+        self.store = store
+        self.partner_code = partner_code
+        self.pdf_dir = pdf_dir
+        self.log_writer = log_writer
+        self.chunk_size = chunk_size
+        self.errors = 0
+        self.pdfs = 0
+        self.logged = 0
+        self._render_pool = None
+        # Replaced by the checkpoint's run ID when resuming, so replayed lines keep their quote IDs.
+        self.run_id = uuid.uuid4().hex
+
+    def process_chunk(self, lines):
+        """Price (line number, raw JSONL line) pairs; returns one result dict per line, in order."""
+        catalog = self.store.current()
+        results = [None] * len(lines)
+        requests, scenarios, positions = [], [], []
+        for i, (line_number, line) in enumerate(lines):
+            result = {"line": line_number}
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("each quote must be an object")
+                if "request_id" in request:
+                    result["request_id"] = request["request_id"]
+                code = str(request.get("partner_code") or self.partner_code or "")
+                partner = catalog.partner_by_code.get(code)
+                if partner is None:
+                    raise ValueError(f"unknown partner code {code!r}")
+                scenario = scenario_from_request(request, partner.margin_percent, catalog.workload_names)
+            except ValueError as e:
+                result["error"] = str(e)
+                results[i] = result
+                continue
+            result["partner_code"] = partner.partner_code
+            result["partner_name"] = partner.partner_name
+            result["customer"] = str(request.get("customer") or "")
+            results[i] = result
+            requests.append(request)
+            scenarios.append(scenario)
+            positions.append(i)
+
+        if scenarios:
+            priced = quote_batch(scenarios, catalog.workloads, catalog.upgrade_rules, catalog.pricing, catalog.configs)
+            for i, row in zip(positions, priced.to_dict("records")):
+                result = results[i]
+                result.update({k: json_value(v) for k, v in row.items()})
+                if result["price_per_unit"] is None:
+                    result["error"] = "no price for this configuration"
+                else:
+                    result["quote_id"] = self.quote_id(result["line"])
+
+        to_render, to_log = [], []
+        for i, request in zip(positions, requests):
+            result = results[i]
+            if "error" in result:
+                continue
+            if request.get("pdf"):
+                if self.pdf_dir:
+                    to_render.append(result)
+                else:
+                    result["pdf_error"] = "no --pdf-dir given"
+            if request.get("log"):
+                if self.log_writer is not None:
+                    to_log.append(result)
+                else:
+                    result["log_error"] = "no --service-account given"
+        if to_render:
+            self._write_pdfs(to_render)
+        if to_log:
+            self._log(to_log)
+        self.errors += sum("error" in r for r in results)
+        return results
+
+    def log_key(self, line_number):
+        return f"{self.run_id}:{line_number}"
+
+    def quote_id(self, line_number):
+        return hashlib.sha256(self.log_key(line_number).encode("utf-8")).hexdigest()[:8]
+
+    def _write_pdfs(self, quotes):
+        from bulk_quotes import render_many, render_pool
+        workers = os.cpu_count() or 1
+        # One pool for the whole run, rather than new processes re-importing reportlab every chunk.
+        if self._render_pool is None:
+            self._render_pool = render_pool(workers)
+        for quote, pdf in zip(quotes, render_many(quotes, workers, self._render_pool)):
+            name = f"{quote['quote_id']}.pdf"
+            with open(os.path.join(self.pdf_dir, name), "wb") as f:
+                f.write(pdf)
+            quote["pdf_file"] = name
+        self.pdfs += len(quotes)
+
+    def _log(self, quotes):
+        import pandas as pd
+        from bulk_quotes import log_rows
+        rows = log_rows(pd.DataFrame(quotes), "", "")
+        for row, quote in zip(rows, quotes):
+            row["partner_code"] = quote["partner_code"]
+            row["pdf_file"] = quote.get("pdf_file", "")
+        self.logged += self.log_writer.submit_many(rows, keys=[self.log_key(quote["line"]) for quote in quotes])
+
+    def close(self):
+        if self._render_pool is not None:
+            self._render_pool.shutdown()
+            self._render_pool = None
+
+    def run(self, infile, outfile, checkpoint=None, report=None):
+        """Process binary `infile` into binary `outfile`, resuming from `checkpoint` if it exists."""
+        state = {"input_offset": 0, "output_offset": 0, "lines": 0, "run_id": self.run_id}
+        if checkpoint:
+            state = read_checkpoint(checkpoint) or state
+            # Checkpoints written before run IDs existed start a new one.
+            self.run_id = state.setdefault("run_id", self.run_id)
+            size = os.fstat(outfile.fileno()).st_size
+            if size < state["output_offset"]:
+                # Seeking past the end would pad the output with NUL bytes.
+                raise ValueError(f"output has {size} bytes but the checkpoint expects at least "
+                                 f"{state['output_offset']}; restore it or delete the checkpoint")
+            infile.seek(state["input_offset"])
+            outfile.seek(state["output_offset"])
+            outfile.truncate()  # drop results written after the last checkpoint
+
+        throughput = Throughput()
+        offset, line_number = state["input_offset"], state["lines"]
+        last_report = time.perf_counter()
+        chunk = []
+        for line in iter(infile.readline, b""):
+            offset += len(line)
+            line_number += 1
+            if line.strip():
+                chunk.append((line_number, line))
+            if len(chunk) < self.chunk_size:
+                continue
+            self._emit(chunk, outfile, throughput)
+            chunk = []
+            if checkpoint:
+                os.fsync(outfile.fileno())
+                write_checkpoint(checkpoint, {"input_offset": offset, "output_offset": outfile.tell(),
+                                              "lines": line_number, "run_id": self.run_id})
+            if report and time.perf_counter() - last_report >= REPORT_INTERVAL:
+                report(throughput)
+                last_report = time.perf_counter()
+        if chunk:
+            self._emit(chunk, outfile, throughput)
+        if checkpoint:
+            os.fsync(outfile.fileno())
+            write_checkpoint(checkpoint, {"input_offset": offset, "output_offset": outfile.tell(), "lines": line_number,
+                                          "run_id": self.run_id})
+        return throughput
+
+    def _emit(self, chunk, outfile, throughput):
+        with tracer.span("stream.chunk", size=len(chunk)):
+            results = self.process_chunk(chunk)
+        outfile.write("".join(json.dumps(r) + "\n" for r in results).encode("utf-8"))
+        outfile.flush()
+        throughput.add(len(chunk))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Price a JSONL stream of quote requests.")
+    parser.add_argument("input", nargs="?", default="-", help="JSONL requests (default: stdin)")
+    parser.add_argument("-o", "--output", default="-", help="JSONL results (default: stdout)")
+    parser.add_argument("--partner-code", help="partner for lines without a partner_code")
+    parser.add_argument("--checkpoint", help="checkpoint file; rerun with the same one to resume")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="lines priced per engine call")
+    parser.add_argument("--pdf-dir", help="directory for PDFs of lines with \"pdf\": true")
+    parser.add_argument("--catalog-dir", default=".", help="directory holding the catalog CSVs")
+    parser.add_argument("--service-account", help="service account JSON for lines with \"log\": true")
+    parser.add_argument("--spool", help="quote log spool for this run (default: <checkpoint or output>.spool.sqlite)")
+    args = parser.parse_args(argv)
+    if args.checkpoint and "-" in (args.input, args.output):
+        parser.error("--checkpoint needs seekable --output and input files")
+
+    log_writer = None
+    if args.service_account:
+        from sheets import SheetsPool
+        from quote_log import QuoteLogWriter
+
+        with open(args.service_account) as f:
+            info = json.load(f)
+        # A spool of our own, so this run neither sends nor races the app's pending rows.
+        spool_path = args.spool
+        if spool_path is None:
+            spool_base = args.checkpoint or (args.output if args.output != "-" else None)
+            spool_path = (f"{spool_base}.spool.sqlite" if spool_base else
+                          os.path.join(tempfile.gettempdir(), f"redsand_stream_spool_{os.getpid()}.sqlite"))
+        log_writer = QuoteLogWriter(SheetsPool(lambda: info).log_worksheet, spool_path=spool_path, failed_csv=None).start()
+    if args.pdf_dir:
+        os.makedirs(args.pdf_dir, exist_ok=True)
+
+    processor = QuoteStreamProcessor(CatalogStore(args.catalog_dir), args.partner_code, args.pdf_dir,
+                                     log_writer, max(1, args.chunk_size))
+
+    def report(throughput):
+        print(f"{throughput.lines:,} lines, {throughput.rate:,.0f} lines/s now, "
+              f"{throughput.overall:,.0f} lines/s overall", file=sys.stderr)
+
+    infile = sys.stdin.buffer if args.input == "-" else open(args.input, "rb")
+    if args.output == "-":
+        outfile = sys.stdout.buffer
+    else:
+        # Resuming keeps earlier results; run() truncates them to the checkpointed offset.
+        outfile = open(args.output, "r+b" if args.checkpoint and os.path.exists(args.output) else "wb")
+    try:
+        throughput = processor.run(infile, outfile, args.checkpoint, report)
+    except ValueError as e:
+        parser.exit(1, f"{e}\n")
+    finally:
+        processor.close()
+        if infile is not sys.stdin.buffer:
+            infile.close()
+        if outfile is not sys.stdout.buffer:
+            outfile.close()
+    print(f"Priced {throughput.lines:,} lines at {throughput.overall:,.0f} lines/s "
+          f"({processor.errors} errors, {processor.pdfs} PDFs, {processor.logged} logged)", file=sys.stderr)
+
+    if log_writer is not None:
+        log_writer.stop()
+        while log_writer.flush():
+            pass
+        print(f"{log_writer.pending()} quote log rows still spooled in {log_writer.spool_path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import threading
+
+import pandas as pd
+
+ROLLUP_VALUES = ["customer_monthly", "redsand_monthly", "margin_monthly"]
+ROLLUP_DIMENSIONS = ["partner_name", "configuration", "gpu_type", "month"]
+
+
+class QuoteRollups:
+    """Quote counts and monthly customer/Redsand/margin totals per partner, configuration, GPU and month.
+
+    `refresh` folds in only the rows stored since the last refresh; a full resync of the store
+    (new generation) starts the totals over.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset(generation=None)
+
+    def _reset(self, generation):
+        self.generation = generation
+        self.last_row = 0
+        self.tables = {
+            dim: pd.DataFrame(columns=["quotes"] + ROLLUP_VALUES, dtype=float).rename_axis(dim)
+            for dim in ROLLUP_DIMENSIONS
+        }
+
+    def refresh(self, store):
+        with self._lock:
+            if store.generation != self.generation:
+                self._reset(store.generation)
+            new_rows = store.rows_after(self.last_row)
+            if not new_rows.empty:
+                self.add(new_rows)
+                self.last_row = int(new_rows["row_num"].max())
+        return self
+
+    def add(self, rows):
+        delta = rows.copy()
+        for col in ROLLUP_VALUES:
+            delta[col] = pd.to_numeric(delta[col], errors="coerce").fillna(0.0)
+        delta["quotes"] = 1.0
+        delta["month"] = pd.to_datetime(delta["timestamp"], errors="coerce", format="ISO8601").dt.strftime("%Y-%m")
+        for dim in ROLLUP_DIMENSIONS:
+            grouped = delta.groupby(dim)[["quotes"] + ROLLUP_VALUES].sum()
+            self.tables[dim] = self.tables[dim].add(grouped, fill_value=0.0)
+
+    # ---------------- READS ----------------
+    def totals(self):
+        table = self.tables["partner_name"]
+        return {col: float(table[col].sum()) for col in ["quotes"] + ROLLUP_VALUES}
+
+    def by(self, dimension):
+        table = self.tables[dimension]
+        if dimension == "month":
+            return table.sort_index()
+        return table.sort_values("customer_monthly", ascending=False)
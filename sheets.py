@@ -0,0 +1,116 @@
+import threading
+import time
+from contextlib import contextmanager
+
+SPREADSHEET_NAME = "RedsandQuotes"
+WORKSHEET_NAME = "Sheet1"
+SCOPES = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+
+# Column order of the quote log sheet.
+LOG_HEADERS = [
+    "timestamp", "partner_code", "partner_name", "quote_id", "use_case",
+    "configuration", "gpu_type", "units", "price_per_unit", "redsand_monthly",
+    "redsand_yearly", "redsand_3yr", "margin_monthly", "margin_yearly",
+    "margin_3yr", "customer_monthly", "customer_yearly", "customer_3yr", "pdf_file"
+]
+
+
+def authorize(service_account_info):
+    """Authorized gspread client for a service account info mapping (e.g. st.secrets section)."""
+    import gspread
+    from google.oauth2.service_account import Credentials
+
+    if service_account_info is None:
+        raise ValueError("gcp_service_account not found in st.secrets")
+    if "private_key" not in service_account_info:
+        raise ValueError("private_key field missing in service account info")
+    creds = Credentials.from_service_account_info(dict(service_account_info), scopes=SCOPES)
+    return gspread.authorize(creds)
+
+
+def is_retryable(error):
+    """True for quota (429) and transient server (5xx) Sheets API errors."""
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    if status is None:
+        return "429" in str(error)
+    return status == 429 or status >= 500
+
+
+# ---------------- CLIENT POOL ----------------
+class TimedWorksheet:
+    """Worksheet proxy that records the latency of every API method call in the pool's counters."""
+
+    def __init__(self, worksheet, pool):
+        self._worksheet = worksheet
+        self._pool = pool
+
+    def __getattr__(self, name):
+        attr = getattr(self._worksheet, name)
+        if not callable(attr):
+            return attr
+
+        def timed(*args, **kwargs):
+            with self._pool.timed(name):
+                return attr(*args, **kwargs)
+        return timed
+
+
+class SheetsPool:
+    """One authorized gspread client and cached worksheet handles shared by the whole process.
+
+    The client's AuthorizedSession refreshes the access token on its own when it expires, so the
+    service account is only re-authorized after `invalidate()` (e.g. on a credentials error).
+    """
+
+    def __init__(self, service_account_info):
+        # Callable returning the service account mapping, so secrets are read on first use.
+        self.service_account_info = service_account_info
+        self._lock = threading.RLock()
+        self._client = None
+        self._worksheets = {}
+        self._stats = {}
+
+    @contextmanager
+    def timed(self, operation):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                count, total, worst = self._stats.get(operation, (0, 0.0, 0.0))
+                self._stats[operation] = (count + 1, total + elapsed, max(worst, elapsed))
+
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                with self.timed("authorize"):
+                    self._client = authorize(self.service_account_info())
+            return self._client
+
+    def worksheet(self, spreadsheet=SPREADSHEET_NAME, worksheet=WORKSHEET_NAME):
+        key = (spreadsheet, worksheet)
+        with self._lock:
+            if key not in self._worksheets:
+                client = self.client()
+                with self.timed("open"):
+                    handle = client.open(spreadsheet).worksheet(worksheet)
+                self._worksheets[key] = TimedWorksheet(handle, self)
+            return self._worksheets[key]
+
+    def log_worksheet(self):
+        return self.worksheet(SPREADSHEET_NAME, WORKSHEET_NAME)
+
+    def invalidate(self):
+        with self._lock:
+            self._client = None
+            self._worksheets.clear()
+
+    def stats(self):
+        """Per-operation call count and mean/max latency in milliseconds."""
+        with self._lock:
+            return {
+                op: {"calls": count, "mean_ms": 1000 * total / count, "max_ms": 1000 * worst}
+                for op, (count, total, worst) in self._stats.items()
+            }
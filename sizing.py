@@ -0,0 +1,161 @@
+import heapq
+import math
+
+import numpy as np
+import pandas as pd
+
+RESOURCES = ["gpus", "storage_gb"]
+
+
+def sizing_demand(catalog, use_case, num_users):
+    """GPU type plus GPU and storage (GB) needed for a use case.
+
+    users_per_unit is measured against the workload's default configuration, so GPU demand is
+    the fractional number of default units times that configuration's GPU count.
+    """
+    sizing = catalog.sizing_by_workload[use_case]
+    gpu_type = catalog.upgrade_gpu(sizing.gpu_type, num_users)
+    base = catalog.config_by_name.get(catalog.config_for_gpu(gpu_type))
+    gpus_per_unit = base.gpu_count if base is not None and base.gpu_count else 1
+    gpus = math.ceil(num_users / sizing.users_per_unit * gpus_per_unit)
+    storage_gb = sizing.storage_gb_per_gpu_base * gpus + sizing.storage_gb_per_user * num_users
+    return gpu_type, np.array([gpus, storage_gb], dtype=float)
+
+
+def compatible_gpus(catalog, gpu_type):
+    """`gpu_type` plus every GPU type gpu_upgrade_rules can move it to, directly or in steps."""
+    targets = {}
+    for row in catalog.upgrade_rules.itertuples(index=False):
+        targets.setdefault(row.current_gpu, set()).add(row.upgrade_gpu)
+    found, stack = {gpu_type}, [gpu_type]
+    while stack:
+        for upgrade in targets.get(stack.pop(), ()):
+            if upgrade not in found:
+                found.add(upgrade)
+                stack.append(upgrade)
+    return found
+
+
+def candidate_skus(catalog, gpu_type):
+    """Priced configurations as (names, monthly prices, capacity matrix), GPUs in `gpu_type` terms.
+
+    Only configurations the workload may run on are considered: `gpu_type` and the types its
+    upgrade rules lead to, with GPU counts scaled by gpu_throughput.csv when the types differ.
+    A configuration that costs at least as much as another for no more capacity is dropped, so
+    the ranking isn't padded with swaps between equivalent SKUs.
+    """
+    throughput = catalog.throughput_by_gpu
+    allowed = compatible_gpus(catalog, gpu_type)
+    names, prices, capacity = [], [], []
+    for record in catalog.config_by_name.values():
+        if record.gpu_type not in allowed:
+            continue
+        if record.gpu_type == gpu_type:
+            factor = 1.0
+        elif gpu_type in throughput and record.gpu_type in throughput:
+            factor = throughput[record.gpu_type] / throughput[gpu_type]
+        else:
+            continue
+        price = catalog.price(record.configuration_name)
+        if price is None or record.gpu_count <= 0:
+            continue
+        names.append(record.configuration_name)
+        prices.append(price)
+        capacity.append([record.gpu_count * factor, record.storage_tb * 1000])
+    prices = np.array(prices, dtype=float)
+    capacity = np.array(capacity, dtype=float).reshape(-1, len(RESOURCES))
+
+    keep = []
+    for j in range(len(names)):
+        dominated = False
+        for i in range(len(names)):
+            if i == j or prices[i] > prices[j] or (capacity[i] < capacity[j]).any():
+                continue
+            # Exact duplicates keep the first; otherwise i is cheaper or has more of something.
+            if prices[i] < prices[j] or (capacity[i] > capacity[j]).any() or i < j:
+                dominated = True
+                break
+        if not dominated:
+            keep.append(j)
+    return [names[j] for j in keep], prices[keep], capacity[keep]
+
+
+def cheapest_mixes(prices, capacity, demand, top_k=5):
+    """Branch-and-bound search for the `top_k` cheapest unit counts covering `demand`.
+
+    Returns [(monthly_cost, counts_array), ...] cheapest first. SKUs are explored in order of
+    price per GPU; a branch is cut when its cost plus a per-resource lower bound on the remaining
+    demand can't beat the k-th best mix found so far.
+    """
+    n = len(prices)
+    if n == 0:
+        return []
+    order = np.argsort(prices / np.maximum(capacity[:, 0], 1e-12), kind="stable")
+    prices, capacity = prices[order], capacity[order]
+
+    # unit_cost[i, d]: cheapest price per unit of resource d among SKUs i.. (inf if none provides it).
+    with np.errstate(divide="ignore"):
+        per_unit = np.where(capacity > 0, prices[:, None] / capacity, np.inf)
+    unit_cost = np.minimum.accumulate(per_unit[::-1], axis=0)[::-1]
+
+    best = []  # max-heap of (-cost, tiebreak, counts)
+    counts = np.zeros(n, dtype=int)
+    tiebreak = [0]
+
+    def bound(i, remaining):
+        need = remaining > 0
+        if not need.any():
+            return 0.0
+        return float(np.max(remaining[need] * unit_cost[i, need]))
+
+    def record(cost):
+        tiebreak[0] += 1
+        item = (-cost, tiebreak[0], counts.copy())
+        if len(best) < top_k:
+            heapq.heappush(best, item)
+        elif cost < -best[0][0]:
+            heapq.heapreplace(best, item)
+
+    def search(i, cost, remaining):
+        if (remaining <= 0).all():
+            record(cost)
+            return
+        if i == n:
+            return
+        lower = bound(i, remaining)
+        if not np.isfinite(lower) or (len(best) == top_k and cost + lower >= -best[0][0]):
+            return
+        cap = capacity[i]
+        need = remaining > 0
+        if (cap[need] <= 0).any() and i == n - 1:
+            return
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratios = np.where(cap > 0, remaining / cap, 0)
+        most = int(math.ceil(max(0.0, ratios[need].max()))) if (cap[need] > 0).any() else 0
+        # The last SKU has to cover everything that is left; earlier ones try every useful count.
+        for k in ([most] if i == n - 1 else range(most, -1, -1)):
+            counts[i] = k
+            search(i + 1, cost + k * prices[i], remaining - k * cap)
+        counts[i] = 0
+
+    search(0, 0.0, demand.astype(float))
+    results = sorted(((-neg, c) for neg, _, c in best), key=lambda r: r[0])
+    inverse = np.argsort(order)
+    return [(cost, c[inverse]) for cost, c in results]
+
+
+def recommend_mixes(catalog, use_case, num_users, top_k=5):
+    """Cheapest configuration mixes for a use case, ranked by monthly cost, as a DataFrame."""
+    gpu_type, demand = sizing_demand(catalog, use_case, num_users)
+    names, prices, capacity = candidate_skus(catalog, gpu_type)
+    rows = []
+    for cost, counts in cheapest_mixes(prices, capacity, demand, top_k=top_k):
+        supplied = counts @ capacity
+        rows.append({
+            "Mix": " + ".join(f"{k} × {name}" for name, k in zip(names, counts) if k),
+            "Units": int(counts.sum()),
+            "Monthly Cost": cost,
+            "GPUs": f"{supplied[0]:,.0f} / {demand[0]:,.0f}",
+            "Storage (TB)": f"{supplied[1] / 1000:,.1f} / {demand[1] / 1000:,.1f}",
+        })
+    return gpu_type, pd.DataFrame(rows)
@@ -0,0 +1,156 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+TRACE_PATH = "/tmp/redsand_trace.jsonl"
+
+
+class Span:
+    __slots__ = ("tracer", "name", "attrs", "start")
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+
+    def end(self, **attrs):
+        self.attrs.update(attrs)
+        self.tracer.record(self.name, (time.perf_counter() - self.start) * 1000, self.attrs)
+
+
+class Tracer:
+    """In-process event and latency recorder.
+
+    Events go into a bounded in-memory ring buffer and a pending queue; a daemon thread appends
+    the queue to a JSONL file every `flush_interval` seconds, rotating it at `max_bytes`. Recent
+    span durations are kept per name for percentile reporting.
+    """
+
+    def __init__(self, path=TRACE_PATH, capacity=10000, samples_per_span=5000,
+                 flush_interval=5.0, max_bytes=5_000_000, backup_count=3):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.events = deque(maxlen=capacity)
+        self._pending = deque(maxlen=capacity)
+        self._durations = {}
+        self._samples_per_span = samples_per_span
+        self._lock = threading.Lock()
+        self._thread = None
+
+    # ---------------- RECORDING ----------------
+    def begin(self, name, **attrs):
+        return Span(self, name, attrs)
+
+    @contextmanager
+    def span(self, name, **attrs):
+        span = self.begin(name, **attrs)
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs["error"] = type(e).__name__
+            raise
+        finally:
+            span.end()
+
+    def traced(self, name):
+        """Decorator form of `span`."""
+        def decorate(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def record(self, name, duration_ms, attrs=None):
+        event = {"ts": datetime.now().isoformat(), "kind": "span", "name": name, "duration_ms": round(duration_ms, 3)}
+        if attrs:
+            event.update(attrs)
+        with self._lock:
+            samples = self._durations.get(name)
+            if samples is None:
+                samples = self._durations[name] = deque(maxlen=self._samples_per_span)
+            samples.append(duration_ms)
+        self._emit(event)
+
+    def log(self, message, **attrs):
+        event = {"ts": datetime.now().isoformat(), "kind": "log", "message": str(message)}
+        event.update(attrs)
+        self._emit(event)
+
+    def _emit(self, event):
+        self.events.append(event)
+        self._pending.append(event)
+        if self._thread is None:
+            self._start()
+
+    # ---------------- FLUSHING ----------------
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-flusher", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        lines = []
+        while self._pending:
+            try:
+                lines.append(json.dumps(self._pending.popleft(), default=str))
+            except IndexError:
+                break
+        if not lines:
+            return
+        try:
+            self._rotate_if_needed()
+            with open(self.path, "a") as f:
+                f.write("\n".join(lines) + "\n")
+        except Exception:
+            pass  # Silent fail to avoid UI clutter
+
+    def _rotate_if_needed(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < self.max_bytes:
+            return
+        for i in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    # ---------------- REPORTING ----------------
+    def durations(self, name):
+        import numpy as np
+        with self._lock:
+            return np.array(self._durations.get(name, ()), dtype=float)
+
+    def stage_names(self):
+        with self._lock:
+            return sorted(self._durations)
+
+    def percentiles(self):
+        """Count and p50/p95/p99/max latency (ms) per span name over the retained samples."""
+        import numpy as np
+        import pandas as pd
+        rows = {}
+        for name in self.stage_names():
+            samples = self.durations(name)
+            if len(samples):
+                p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+                rows[name] = {"count": len(samples), "p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "max_ms": samples.max()}
+        return pd.DataFrame.from_dict(rows, orient="index")
+
+
+tracer = Tracer()